@@ -1,17 +1,21 @@
 from datetime import datetime, timedelta, timezone
 from typing import Optional
+import hashlib
+import time
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
-import bcrypt
 from pydantic import BaseModel, Field
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 import httpx
 
 from app.backend.database import UserDB, RoleEnum
-from app.backend.database import get_db
+from app.backend.database import get_read_db, get_write_db
+from app.backend.hashing import password_hasher
+from app.backend.cache import TTLCache
 
 
 # Настройки JWT берём из окружения (с дефолтами для dev)
@@ -19,6 +23,8 @@ import os
 SECRET_KEY = os.getenv("TM_SECRET_KEY", "CHANGE_ME_DEV_SECRET")
 ALGORITHM = os.getenv("TM_JWT_ALG", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("TM_ACCESS_EXPIRE_MIN", "1440"))
+# Размер кэша проверенных токенов (0 - выключить)
+TOKEN_CACHE_SIZE = int(os.getenv("TM_TOKEN_CACHE_SIZE", "10000"))
 
 # Яндекс OAuth
 YA_CLIENT_ID = os.getenv("TM_YA_CLIENT_ID", "")
@@ -29,6 +35,7 @@ YA_TOKEN_URL = "https://oauth.yandex.ru/token"
 YA_USERINFO_URL = "https://login.yandex.ru/info"
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login", auto_error=False)
 
 auth_router = APIRouter(prefix="/api/v1/auth", tags=["auth"]) 
 
@@ -49,39 +56,6 @@ class UserOut(BaseModel):
     role: str
 
 
-def hash_password(password: str) -> str:
-    """
-    Хэширует пароль используя bcrypt.
-    Bcrypt ограничивает пароль 72 байтами, поэтому обрезаем при необходимости.
-    """
-    password_bytes = password.encode('utf-8')
-    # Bcrypt ограничивает пароль 72 байтами
-    if len(password_bytes) > 72:
-        password_bytes = password_bytes[:72]
-    
-    # Генерируем соль и хэшируем пароль
-    salt = bcrypt.gensalt(rounds=12)
-    hashed = bcrypt.hashpw(password_bytes, salt)
-    # Возвращаем как строку для хранения в БД
-    return hashed.decode('utf-8')
-
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """
-    Проверяет пароль против хэша.
-    """
-    try:
-        password_bytes = plain_password.encode('utf-8')
-        # Bcrypt ограничивает пароль 72 байтами
-        if len(password_bytes) > 72:
-            password_bytes = password_bytes[:72]
-        
-        hashed_bytes = hashed_password.encode('utf-8')
-        return bcrypt.checkpw(password_bytes, hashed_bytes)
-    except Exception:
-        return False
-
-
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -95,21 +69,29 @@ async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User
 
 
 @auth_router.post("/register", response_model=UserOut, status_code=201)
-async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
-    existing = await get_user_by_username(db, user.username)
-    if existing:
+async def register(
+    user: UserCreate,
+    read_db: AsyncSession = Depends(get_read_db),
+    db: AsyncSession = Depends(get_write_db),
+):
+    # Проверка и хэширование - до записи, чтобы не держать соединение писателя
+    if await get_user_by_username(read_db, user.username):
         raise HTTPException(status_code=400, detail="Пользователь уже существует")
-    db_user = UserDB(username=user.username, hashed_password=hash_password(user.password))
+    db_user = UserDB(username=user.username, hashed_password=await password_hasher.hash(user.password))
     db.add(db_user)
-    await db.commit()
-    await db.refresh(db_user)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Параллельная регистрация с тем же именем
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Пользователь уже существует")
     return UserOut(id=db_user.id, username=db_user.username, role=db_user.role.value)
 
 
 @auth_router.post("/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_read_db)):
     user = await get_user_by_username(db, form_data.username)
-    if user is None or not verify_password(form_data.password, user.hashed_password):
+    if user is None or not await password_hasher.verify(form_data.password, user.hashed_password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Неверные учетные данные")
     token = create_access_token({"sub": user.id, "username": user.username, "role": user.role.value})
     return Token(access_token=token)
@@ -137,7 +119,11 @@ async def yandex_login():
 
 
 @auth_router.post("/yandex/callback", response_model=Token)
-async def yandex_callback(code: str, db: AsyncSession = Depends(get_db)):
+async def yandex_callback(
+    code: str,
+    read_db: AsyncSession = Depends(get_read_db),
+    db: AsyncSession = Depends(get_write_db),
+):
     if not YA_CLIENT_ID or not YA_REDIRECT_URI:
         raise HTTPException(status_code=500, detail="Яндекс OAuth не настроен")
     data = {
@@ -169,18 +155,22 @@ async def yandex_callback(code: str, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=400, detail="В ответе Яндекс нет id пользователя")
     username = f"ya_{ya_user_id}"
 
-    user = await get_user_by_username(db, username)
+    user = await get_user_by_username(read_db, username)
     if not user:
         # Создаём пользователя со случайным паролем (не используется)
         import secrets
         user = UserDB(
             username=username,
-            hashed_password=hash_password(secrets.token_urlsafe(16)),
+            hashed_password=await password_hasher.hash(secrets.token_urlsafe(16)),
             role=RoleEnum.USER,
         )
         db.add(user)
-        await db.commit()
-        await db.refresh(user)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # Параллельный вход того же пользователя уже создал запись
+            await db.rollback()
+            user = await get_user_by_username(db, username)
 
     token = create_access_token({"sub": user.id, "username": user.username, "role": user.role.value})
     return Token(access_token=token)
@@ -192,7 +182,27 @@ class CurrentUser(BaseModel):
     role: RoleEnum
 
 
+# Кэш проверенных токенов: sha256(токен) -> CurrentUser, запись живёт до exp токена
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, clock=time.time)
+
+
+def _token_cache_key(token: str) -> bytes:
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
+def rotate_secret_key(new_secret_key: str) -> None:
+    """Смена ключа подписи JWT: все ранее проверенные токены вычищаются из кэша"""
+    global SECRET_KEY
+    SECRET_KEY = new_secret_key
+    token_cache.clear()
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> CurrentUser:
+    cache_key = _token_cache_key(token)
+    cached = token_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Не удалось проверить учетные данные",
@@ -207,7 +217,27 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> CurrentUser:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    return CurrentUser(id=user_id, username=username, role=RoleEnum(role))
+    current_user = CurrentUser(id=user_id, username=username, role=RoleEnum(role))
+    # Без exp токен бессрочный - такие не кэшируем
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        token_cache.set(cache_key, current_user, expires_at=float(exp))
+    return current_user
+
+
+async def get_stream_user(
+    token: Optional[str] = Depends(oauth2_scheme_optional),
+    access_token: Optional[str] = Query(None, description="JWT, если клиент не может передать заголовок (EventSource)"),
+) -> CurrentUser:
+    """Пользователь для потоковых эндпоинтов: токен из Authorization или из ?access_token="""
+    token = token or access_token
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await get_current_user(token)
 
 
 def require_admin(user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
@@ -223,7 +253,7 @@ async def ensure_admin(db: AsyncSession, username: str = "admin", password: str
     if existing is None:
         admin = UserDB(
             username=username,
-            hashed_password=hash_password(password),
+            hashed_password=await password_hasher.hash(password),
             role=RoleEnum.ADMIN,
         )
         db.add(admin)
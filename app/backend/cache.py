@@ -0,0 +1,150 @@
+"""
+Внутрипроцессные кэши.
+
+TTLCache - ограниченный по размеру LRU-кэш, у каждой записи свой срок жизни.
+Ведёт счётчики попаданий/промахов, чтобы по ним подбирать размер кэша.
+
+CacheBackend - интерфейс хранилища для кэшей чтения (read-through) с
+асинхронными методами, чтобы за ним могло стоять и внешнее хранилище;
+LocalCacheBackend - реализация в памяти процесса поверх TTLCache.
+"""
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Set
+
+
+class TTLCache:
+    """LRU-кэш на maxsize записей с истечением по времени (maxsize=0 - кэш выключен)"""
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        # key -> (value, expires_at); порядок - от давно использованных к недавним
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at is None or expires_at > self._clock():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+        self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None) -> None:
+        """Сохраняет значение до expires_at (по часам кэша) или на ttl, если срок не задан"""
+        if self.maxsize <= 0:
+            return
+        if expires_at is None and self.ttl is not None:
+            expires_at = self._clock() + self.ttl
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Hashable) -> bool:
+        return self._data.pop(key, None) is not None
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hit_ratio, 4),
+        }
+
+
+class CacheBackend(ABC):
+    """Интерфейс хранилища кэша чтения"""
+
+    def __init__(self):
+        # Фоновые инвалидации discard/discard_all: цикл событий держит задачи лишь по слабой ссылке
+        self._invalidations: Set[asyncio.Task] = set()
+
+    @abstractmethod
+    async def get(self, key: Hashable) -> Any:
+        """Значение или None"""
+
+    @abstractmethod
+    async def set(self, key: Hashable, value: Any) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: Hashable) -> None:
+        ...
+
+    @abstractmethod
+    async def clear(self) -> None:
+        ...
+
+    def discard(self, key: Hashable) -> None:
+        """Инвалидация из синхронного кода (подписчики шины): по умолчанию delete в фоне"""
+        self._in_background(self.delete(key))
+
+    def discard_all(self) -> None:
+        self._in_background(self.clear())
+
+    async def settle(self) -> None:
+        """Дожидается фоновых инвалидаций: get после него не вернёт уже инвалидированное"""
+        if self._invalidations:
+            await asyncio.gather(*self._invalidations, return_exceptions=True)
+
+    def _in_background(self, coroutine) -> None:
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self._invalidations.add(task)
+        task.add_done_callback(self._invalidations.discard)
+
+    def stats(self) -> dict:
+        return {}
+
+
+class LocalCacheBackend(CacheBackend):
+    """Хранилище в памяти процесса (TTL + LRU)"""
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        super().__init__()
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, key: Hashable) -> Any:
+        return self.cache.get(key)
+
+    async def set(self, key: Hashable, value: Any) -> None:
+        self.cache.set(key, value)
+
+    async def delete(self, key: Hashable) -> None:
+        self.cache.delete(key)
+
+    async def clear(self) -> None:
+        self.cache.clear()
+
+    def discard(self, key: Hashable) -> None:
+        self.cache.delete(key)
+
+    def discard_all(self) -> None:
+        self.cache.clear()
+
+    def stats(self) -> dict:
+        return self.cache.stats()
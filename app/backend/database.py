@@ -1,9 +1,19 @@
-from sqlalchemy import Column, String, DateTime, Enum as SQLEnum, create_engine, ForeignKey
+from sqlalchemy import Column, Computed, String, DateTime, Integer, Float, Enum as SQLEnum, Index, MetaData, Table, create_engine, ForeignKey, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.backend.metrics import db_pool_checkout_wait
+from dataclasses import dataclass
+from contextvars import ContextVar
+from typing import Optional
+import asyncio
 import enum
+import logging
+import re
+import time
 from datetime import datetime, timezone
 import uuid
 
@@ -19,10 +29,258 @@ import os
 _env_db = os.getenv("TM_DATABASE_URL")
 DATABASE_URL = _env_db if (_env_db and _env_db.strip()) else f"sqlite+aiosqlite:///{_db_path}"
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+
+
+@dataclass
+class EngineProfile:
+    """
+    Профиль движка БД: логирование SQL, PRAGMA для каждого соединения SQLite и пул.
+    Базовые значения задаёт TM_DB_PROFILE (production по умолчанию или dev),
+    любое поле можно переопределить отдельной переменной TM_*.
+    """
+    name: str = "production"
+    echo: bool = False
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    busy_timeout_ms: int = 5000
+    mmap_size: int = 256 * 1024 * 1024
+    # Отрицательное значение - размер в КиБ (64 МиБ на соединение)
+    cache_size: int = -64000
+    temp_store: str = "MEMORY"
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "EngineProfile":
+        name = os.getenv("TM_DB_PROFILE", "production").strip().lower() or "production"
+        # dev отличается только логированием всех SQL-запросов
+        profile = cls(name=name, echo=(name == "dev"))
+        overrides = {
+            "echo": ("TM_DB_ECHO", lambda v: v.strip().lower() in ("1", "true", "yes", "on")),
+            "journal_mode": ("TM_SQLITE_JOURNAL_MODE", str.upper),
+            "synchronous": ("TM_SQLITE_SYNCHRONOUS", str.upper),
+            "busy_timeout_ms": ("TM_SQLITE_BUSY_TIMEOUT_MS", int),
+            "mmap_size": ("TM_SQLITE_MMAP_SIZE", int),
+            "cache_size": ("TM_SQLITE_CACHE_SIZE", int),
+            "temp_store": ("TM_SQLITE_TEMP_STORE", str.upper),
+            "pool_size": ("TM_DB_POOL_SIZE", int),
+            "max_overflow": ("TM_DB_MAX_OVERFLOW", int),
+            "pool_timeout": ("TM_DB_POOL_TIMEOUT", float),
+        }
+        for field_name, (env_name, parse) in overrides.items():
+            value = os.getenv(env_name)
+            if value is not None and value.strip():
+                setattr(profile, field_name, parse(value.strip()))
+        return profile
+
+    def sqlite_pragmas(self) -> list:
+        """PRAGMA, выполняемые на каждом новом соединении SQLite"""
+        return [
+            f"PRAGMA journal_mode={self.journal_mode}",
+            f"PRAGMA synchronous={self.synchronous}",
+            f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}",
+            f"PRAGMA mmap_size={int(self.mmap_size)}",
+            f"PRAGMA cache_size={int(self.cache_size)}",
+            f"PRAGMA temp_store={self.temp_store}",
+        ]
+
+
+ENGINE_PROFILE = EngineProfile.from_env()
+
+
+def _is_sqlite_memory(url: str) -> bool:
+    return url.startswith("sqlite") and (":memory:" in url or url.rstrip("/").endswith(":"))
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Пул, замеряющий ожидание свободного соединения (метрика tm_db_pool_checkout_wait_seconds)"""
+    metrics_label = "default"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_checkout_wait.observe(time.perf_counter() - started, self.metrics_label)
+
+
+def _create_engine(url: str, profile: EngineProfile, pool_size: int = None, max_overflow: int = None,
+                   query_only: bool = False, label: str = "default"):
+    """
+    Создаёт async-движок по профилю. pool_size/max_overflow переопределяют
+    размеры пула профиля, query_only открывает соединения SQLite только на чтение,
+    label - метка пула в метриках.
+    """
+    kwargs = {"echo": profile.echo}
+    if not _is_sqlite_memory(url):
+        # Для файловой SQLite по умолчанию NullPool - соединение (и все PRAGMA)
+        # открывалось бы на каждую сессию; держим постоянный пул
+        kwargs.update(
+            poolclass=TimedQueuePool,
+            pool_size=profile.pool_size if pool_size is None else pool_size,
+            max_overflow=profile.max_overflow if max_overflow is None else max_overflow,
+            pool_timeout=profile.pool_timeout,
+        )
+    new_engine = create_async_engine(url, **kwargs)
+    new_engine.sync_engine.pool.metrics_label = label
+
+    if new_engine.dialect.name == "sqlite":
+        pragmas = profile.sqlite_pragmas()
+        if query_only:
+            pragmas.append("PRAGMA query_only=ON")
+
+        @event.listens_for(new_engine.sync_engine, "connect")
+        def _apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+
+    return new_engine
+
+
+# Раздельные пулы для файловой SQLite: писатель в WAL всё равно один, поэтому
+# пул записи - одно соединение, а чтения идут через отдельный пул query_only
+# и не ждут в очереди за пишущими запросами (и наоборот)
+SPLIT_POOLS = DATABASE_URL.startswith("sqlite") and not _is_sqlite_memory(DATABASE_URL)
+if SPLIT_POOLS:
+    engine = _create_engine(DATABASE_URL, ENGINE_PROFILE, pool_size=1, max_overflow=0, label="write")
+    read_engine = _create_engine(DATABASE_URL, ENGINE_PROFILE, query_only=True, label="read")
+else:
+    engine = read_engine = _create_engine(DATABASE_URL, ENGINE_PROFILE)
+# Триггеры и прочие SQLite-специфичные объекты создаём только для SQLite
+IS_SQLITE = engine.dialect.name == "sqlite"
+
+
+# Учёт SQL по HTTP-запросам: middleware (app/backend/middleware.py) кладёт в контекст
+# QueryStats, обработчики событий движков добавляют в него число и время запросов.
+# Запросы дольше TM_SLOW_QUERY_MS (0 - выключить) пишутся в лог с планом и
+# сокращёнными параметрами
+SLOW_QUERY_MS = float(os.getenv("TM_SLOW_QUERY_MS", "200"))
+# Начала плана: EXPLAIN QUERY PLAN имеет смысл только для DML
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+# Параметры запросов к этим таблицам в лог не попадают (хэши паролей)
+_SECRET_TABLES = re.compile(r"\busers\b", re.IGNORECASE)
+# Сколько символов строкового параметра и строк executemany показывать
+_LOG_TEXT_CHARS = 16
+_LOG_MANY_ROWS = 3
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueryStats:
+    """Число и суммарное время (с) SQL-запросов одного HTTP-запроса"""
+    count: int = 0
+    duration: float = 0.0
+
+
+query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def _query_plan(conn, statement: str, parameters) -> str:
+    """EXPLAIN QUERY PLAN через сырой курсор драйвера (мимо событий движка)"""
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        return "\n".join(f"    {row[-1]}" for row in cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def _short_value(value):
+    """Строки - только начало и длина, байты - только длина"""
+    if isinstance(value, str) and len(value) > _LOG_TEXT_CHARS:
+        return f"{value[:_LOG_TEXT_CHARS]}…({len(value)})"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<{len(value)} байт>"
+    return value
+
+
+def _loggable_parameters(statement: str, parameters, executemany: bool) -> str:
+    """Параметры для лога: без значений для таблиц с секретами, строки сокращены"""
+    if _SECRET_TABLES.search(statement):
+        return "<скрыты>"
+
+    def row(values):
+        if isinstance(values, dict):
+            return {key: _short_value(value) for key, value in values.items()}
+        return tuple(_short_value(value) for value in values)
+
+    if not executemany:
+        return repr(row(parameters))
+    rows = list(parameters)
+    shown = repr([row(values) for values in rows[:_LOG_MANY_ROWS]])
+    return shown if len(rows) <= _LOG_MANY_ROWS else f"{shown} ... всего строк: {len(rows)}"
+
+
+def _log_slow_query(conn, statement: str, parameters, executemany: bool, elapsed: float) -> None:
+    message = (
+        f"Медленный SQL-запрос ({elapsed * 1000:.1f} мс): {' '.join(statement.split())}\n"
+        f"  параметры: {_loggable_parameters(statement, parameters, executemany)}"
+    )
+    if IS_SQLITE and not executemany and statement.lstrip().upper().startswith(_EXPLAINABLE):
+        try:
+            message += "\n  план:\n" + _query_plan(conn, statement, parameters)
+        except Exception as exc:
+            message += f"\n  план недоступен: {exc!r}"
+    logger.warning(message)
+
+
+def _install_query_hooks(target_engine) -> None:
+    @event.listens_for(target_engine.sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context.query_started = time.perf_counter()
+
+    @event.listens_for(target_engine.sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context.query_started
+        stats = query_stats.get()
+        if stats is not None:
+            stats.count += 1
+            stats.duration += elapsed
+        if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+            _log_slow_query(conn, statement, parameters, executemany, elapsed)
+
+
+_install_query_hooks(engine)
+if read_engine is not engine:
+    _install_query_hooks(read_engine)
+
+
+def engine_profile_info() -> dict:
+    """Активный профиль движка (для /health)"""
+    info = {"profile": ENGINE_PROFILE.name, "echo": ENGINE_PROFILE.echo, "dialect": engine.dialect.name}
+    if IS_SQLITE:
+        info.update(
+            journal_mode=ENGINE_PROFILE.journal_mode,
+            synchronous=ENGINE_PROFILE.synchronous,
+            busy_timeout_ms=ENGINE_PROFILE.busy_timeout_ms,
+            mmap_size=ENGINE_PROFILE.mmap_size,
+            cache_size=ENGINE_PROFILE.cache_size,
+            temp_store=ENGINE_PROFILE.temp_store,
+        )
+    info.update(pool=type(engine.pool).__name__, pool_size=ENGINE_PROFILE.pool_size, max_overflow=ENGINE_PROFILE.max_overflow)
+    if SPLIT_POOLS:
+        info.update(write_pool_size=1, read_pool_size=ENGINE_PROFILE.pool_size)
+    return info
+
+
+async def dispose_engines() -> None:
+    """Закрывает соединения всех пулов"""
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
+
+
 AsyncSessionLocal = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
+# Сессии только для чтения (отдельный пул query_only для файловой SQLite)
+AsyncReadSessionLocal = sessionmaker(
+    read_engine, class_=AsyncSession, expire_on_commit=False
+)
 
 Base = declarative_base()
 
@@ -39,6 +297,17 @@ class PriorityEnum(enum.Enum):
     MEDIUM = "средний"
     HIGH = "высокий"
 
+# Условие "задача не завершена" литералом: частичный индекс применяется, только если
+# его условие дословно есть в WHERE запроса (сравнение с параметром не подходит)
+OPEN_TASK_SQL = f"status != '{TaskStatusEnum.COMPLETED.name}'"
+
+# Вес приоритета для сортировки (высокий > средний > низкий) - вычисляемая колонка
+# tasks.priority_rank, чтобы сортировка и курсор шли по обычному индексу
+PRIORITY_RANK_SQL = (
+    f"CASE priority WHEN '{PriorityEnum.HIGH.name}' THEN 3 WHEN '{PriorityEnum.MEDIUM.name}' THEN 2 "
+    f"WHEN '{PriorityEnum.LOW.name}' THEN 1 ELSE 0 END"
+)
+
 class RoleEnum(enum.Enum):
     """Роли пользователей"""
     ADMIN = "admin"
@@ -70,12 +339,378 @@ class TaskDB(Base):
     deadline = Column(DateTime, nullable=True)
     created_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    priority_rank = Column(Integer, Computed(PRIORITY_RANK_SQL))
 
     # user = relationship("UserDB", backref="tasks")
 
+    # Индексы под пути доступа get_tasks/get_statistics: фильтр по владельцу +
+    # ключ сортировки + id (тай-брейк пагинации), для админа - без владельца.
+    # Частичные индексы *_open_deadline - только незавершённые задачи, по ним
+    # просроченные считаются без обхода завершённых.
+    # Новые индексы добавляются в схему только через миграции (app/backend/migrations.py)
+    __table_args__ = (
+        Index("ix_tasks_user_created", "user_id", "created_at", "id"),
+        Index("ix_tasks_user_updated", "user_id", "updated_at", "id"),
+        Index("ix_tasks_user_status", "user_id", "status", "id"),
+        Index("ix_tasks_user_priority", "user_id", "priority_rank", "id"),
+        Index("ix_tasks_user_deadline", "user_id", "deadline", "id"),
+        Index("ix_tasks_created", "created_at", "id"),
+        Index("ix_tasks_deadline", "deadline", "id"),
+        Index("ix_tasks_updated", "updated_at", "id"),
+        Index("ix_tasks_status", "status", "id"),
+        Index("ix_tasks_priority", "priority_rank", "id"),
+        Index("ix_tasks_user_open_deadline", "user_id", "deadline", sqlite_where=text(OPEN_TASK_SQL)),
+        Index("ix_tasks_open_deadline", "deadline", sqlite_where=text(OPEN_TASK_SQL)),
+    )
+
+
+# Ключ глобальной строки в task_counters (счётчики по всем пользователям)
+GLOBAL_COUNTERS_KEY = "*"
+# Поля task_counters, которые не зависят от текущего времени и поддерживаются инкрементально
+COUNTER_FIELDS = ("total", "created", "in_progress", "completed", "high_priority", "medium_priority", "low_priority")
+
+
+class TaskCounterDB(Base):
+    """Материализованные счётчики задач по пользователю (user_id = '*' - по всем)"""
+    __tablename__ = "task_counters"
+
+    user_id = Column(String, primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+    created = Column(Integer, nullable=False, default=0)
+    in_progress = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+    high_priority = Column(Integer, nullable=False, default=0)
+    medium_priority = Column(Integer, nullable=False, default=0)
+    low_priority = Column(Integer, nullable=False, default=0)
+    # Версия набора задач ключа: растёт при любом изменении его задач (для ETag)
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+def _counter_terms(row: str) -> dict:
+    """SQL-выражения вкладов строки задачи (NEW/OLD) в каждый счётчик"""
+    return {
+        "total": "1",
+        "created": f"({row}.status = '{TaskStatusEnum.CREATED.name}')",
+        "in_progress": f"({row}.status = '{TaskStatusEnum.IN_PROGRESS.name}')",
+        "completed": f"({row}.status = '{TaskStatusEnum.COMPLETED.name}')",
+        "high_priority": f"({row}.priority = '{PriorityEnum.HIGH.name}')",
+        "medium_priority": f"({row}.priority = '{PriorityEnum.MEDIUM.name}')",
+        "low_priority": f"({row}.priority = '{PriorityEnum.LOW.name}')",
+    }
+
+
+def _counter_upsert(key: str, row: str, sign: str) -> str:
+    """Прибавляет (sign='+') или вычитает (sign='-') вклад строки задачи в счётчики ключа"""
+    terms = _counter_terms(row)
+    columns = ", ".join(COUNTER_FIELDS)
+    values = ", ".join(f"{sign}{terms[f]}" for f in COUNTER_FIELDS)
+    updates = ", ".join(f"{f} = {f} + excluded.{f}" for f in COUNTER_FIELDS)
+    return (
+        f"INSERT INTO task_counters (user_id, {columns}) VALUES ({key}, {values}) "
+        f"ON CONFLICT(user_id) DO UPDATE SET {updates};"
+    )
+
+
+_GLOBAL_KEY_SQL = f"'{GLOBAL_COUNTERS_KEY}'"
+
+# Триггеры обновляют task_counters в той же транзакции, что и запись в tasks,
+# поэтому счётчики верны для любых путей записи (CRUD, массовые операции, импорт)
+TASK_COUNTERS_TRIGGERS = (
+    "CREATE TRIGGER IF NOT EXISTS tasks_counters_ai AFTER INSERT ON tasks BEGIN "
+    + _counter_upsert("NEW.user_id", "NEW", "+")
+    + _counter_upsert(_GLOBAL_KEY_SQL, "NEW", "+")
+    + " END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_counters_ad AFTER DELETE ON tasks BEGIN "
+    + _counter_upsert("OLD.user_id", "OLD", "-")
+    + _counter_upsert(_GLOBAL_KEY_SQL, "OLD", "-")
+    + " END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_counters_au AFTER UPDATE OF status, priority, user_id ON tasks BEGIN "
+    + _counter_upsert("OLD.user_id", "OLD", "-")
+    + _counter_upsert(_GLOBAL_KEY_SQL, "OLD", "-")
+    + _counter_upsert("NEW.user_id", "NEW", "+")
+    + _counter_upsert(_GLOBAL_KEY_SQL, "NEW", "+")
+    + " END",
+)
+
 
-async def get_db():
-    """Получение сессии базы данных"""
+def _counter_select(key: str, group: bool) -> str:
+    terms = _counter_terms("tasks")
+    # Последнее значение - версия новой строки (см. REBUILD_TASK_COUNTERS_SQL)
+    aggregates = ", ".join(f"SUM({terms[f]})" for f in COUNTER_FIELDS) + ", 1"
+    if group:
+        # Задачи без владельца (старые БД) учитываются только в глобальной строке
+        return f"SELECT {key}, {aggregates} FROM tasks WHERE user_id IS NOT NULL GROUP BY user_id"
+    # WHERE true - иначе SQLite не разберёт INSERT ... SELECT ... ON CONFLICT
+    return f"SELECT {key}, {aggregates} FROM tasks WHERE true HAVING COUNT(*) > 0"
+
+
+_COUNTERS_FROM_SELECT = (
+    f"INSERT INTO task_counters (user_id, {', '.join(COUNTER_FIELDS)}, version) {{select}} "
+    "ON CONFLICT(user_id) DO UPDATE SET " + ", ".join(f"{f} = excluded.{f}" for f in COUNTER_FIELDS)
+)
+
+# Полный пересчёт task_counters из tasks. Строки не удаляются, а обнуляются:
+# версия каждого ключа растёт, чтобы выданные ранее ETag не совпали с новыми.
+# Строки, которых не было, создаются с версией 1: отсутствующая строка читается
+# как версия 0 (get_change_version), и ETag, выданный до пересчёта, тоже не совпадёт
+REBUILD_TASK_COUNTERS_SQL = (
+    "UPDATE task_counters SET " + ", ".join(f"{f} = 0" for f in COUNTER_FIELDS) + ", version = version + 1",
+    _COUNTERS_FROM_SELECT.format(select=_counter_select("user_id", group=True)),
+    _COUNTERS_FROM_SELECT.format(select=_counter_select(_GLOBAL_KEY_SQL, group=False)),
+)
+
+
+def _version_bump(key: str) -> str:
+    """Увеличивает версию ключа (строка счётчиков создаётся, если её ещё нет)"""
+    zeros = ", ".join("0" for _ in COUNTER_FIELDS)
+    return (
+        f"INSERT INTO task_counters (user_id, {', '.join(COUNTER_FIELDS)}, version) "
+        f"SELECT {key}, {zeros}, 1 WHERE {key} IS NOT NULL "
+        "ON CONFLICT(user_id) DO UPDATE SET version = version + 1;"
+    )
+
+
+# Версии task_counters.version: любое изменение задачи (в том числе title и
+# description, которые на счётчики не влияют) меняет версию владельца и глобальную
+TASK_VERSION_TRIGGERS = (
+    "CREATE TRIGGER IF NOT EXISTS tasks_version_ai AFTER INSERT ON tasks BEGIN "
+    + _version_bump("NEW.user_id") + _version_bump(_GLOBAL_KEY_SQL) + " END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_version_ad AFTER DELETE ON tasks BEGIN "
+    + _version_bump("OLD.user_id") + _version_bump(_GLOBAL_KEY_SQL) + " END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_version_au AFTER UPDATE ON tasks BEGIN "
+    + _version_bump("OLD.user_id") + _version_bump("NEW.user_id") + _version_bump(_GLOBAL_KEY_SQL) + " END",
+)
+
+
+async def rebuild_task_counters(conn) -> None:
+    """Пересчитывает task_counters по таблице tasks (conn - соединение или сессия, в её транзакции)"""
+    for statement in REBUILD_TASK_COUNTERS_SQL:
+        await conn.execute(text(statement))
+
+
+# Полнотекстовый поиск (SQLite FTS5) по названию и описанию задач.
+# unicode61 приводит к нижнему регистру и кириллицу; "ё" сводим к "е" сами - и при
+# индексации (в триггерах), и в запросе (services._fts_query), т.к. пишут по-разному.
+# rowid строки индекса совпадает с rowid задачи в tasks. Таблица не входит в
+# Base.metadata: создаётся миграцией, здесь только описание колонок для запросов.
+tasks_fts = Table(
+    "tasks_fts", MetaData(),
+    Column("rowid", Integer),
+    Column("title", String),
+    Column("description", String),
+    Column("rank", Float),
+)
+
+
+def _fts_normalize(expr: str) -> str:
+    return f"replace(replace({expr}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+_FTS_INSERT_NEW = (
+    "INSERT INTO tasks_fts (rowid, title, description) VALUES "
+    f"(NEW.rowid, {_fts_normalize('NEW.title')}, {_fts_normalize('NEW.description')});"
+)
+
+TASKS_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(title, description, tokenize = 'unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN " + _FTS_INSERT_NEW + " END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN "
+    "DELETE FROM tasks_fts WHERE rowid = OLD.rowid; END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_au AFTER UPDATE OF title, description ON tasks BEGIN "
+    "DELETE FROM tasks_fts WHERE rowid = OLD.rowid; " + _FTS_INSERT_NEW + " END",
+)
+
+# Полная переиндексация. Нужна и после VACUUM: у tasks нет INTEGER PRIMARY KEY,
+# поэтому VACUUM может перенумеровать rowid
+REBUILD_TASKS_FTS_SQL = (
+    "DELETE FROM tasks_fts",
+    "INSERT INTO tasks_fts (rowid, title, description) "
+    f"SELECT rowid, {_fts_normalize('title')}, {_fts_normalize('description')} FROM tasks",
+)
+
+
+async def rebuild_search_index(conn) -> None:
+    """Переиндексирует tasks_fts по таблице tasks (conn - соединение или сессия, в её транзакции)"""
+    for statement in REBUILD_TASKS_FTS_SQL:
+        await conn.execute(text(statement))
+
+
+class DeletedTaskDB(Base):
+    """Журнал удалённых задач (tombstone) для дельта-синхронизации /tasks/changes"""
+    __tablename__ = "deleted_tasks"
+
+    task_id = Column(String, primary_key=True)
+    user_id = Column(String, nullable=True)
+    deleted_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_deleted_tasks_user_deleted", "user_id", "deleted_at"),
+        Index("ix_deleted_tasks_deleted", "deleted_at"),
+    )
+
+
+# Для SQLite tombstone пишет триггер; формат deleted_at - как у DateTime SQLAlchemy
+# (микросекунды), чтобы сравнение строк с параметром since было корректным
+TASK_TOMBSTONE_TRIGGERS = (
+    "CREATE TRIGGER IF NOT EXISTS tasks_tombstone_ad AFTER DELETE ON tasks BEGIN "
+    "INSERT OR REPLACE INTO deleted_tasks (task_id, user_id, deleted_at) "
+    "VALUES (OLD.id, OLD.user_id, strftime('%Y-%m-%d %H:%M:%f', 'now') || '000'); END",
+)
+
+
+class CacheInvalidationDB(Base):
+    """
+    Журнал ключей инвалидации кэшей для шины между воркерами (app/backend/invalidation.py):
+    id растёт с каждым коммитом и служит счётчиком версии, origin - воркер-автор
+    """
+    __tablename__ = "cache_invalidations"
+    __table_args__ = (
+        Index("ix_cache_invalidations_created", "created_at"),
+        {"sqlite_autoincrement": True},
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    key = Column(String, nullable=False)
+    origin = Column(String, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+
+class WriteQueueStopped(RuntimeError):
+    """Очередь записи остановлена, операция не выполнялась"""
+
+
+class WriteQueue:
+    """
+    Очередь записи с групповым коммитом: один писатель забирает накопившиеся
+    операции (до max_batch, ожидая до max_delay секунд) и выполняет их в одной
+    транзакции. Операция - корутина operation(session) без собственного commit.
+    Если общий коммит не удался, операции пачки повторяются каждая в своей
+    транзакции, чтобы ошибка одной не откатывала остальные.
+    После начала остановки новые операции не принимаются (WriteQueueStopped).
+    """
+
+    def __init__(self, session_factory, max_batch: int = 64, max_delay: float = 0.002):
+        self.session_factory = session_factory
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max(0.0, max_delay)
+        self.batches = 0
+        self.operations = 0
+        self._queue: asyncio.Queue = None
+        self._writer: asyncio.Task = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._writer is not None and not self._writer.done() and not self._stopping
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._stopping = False
+        self._queue = asyncio.Queue()
+        self._writer = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Дожидается выполнения операций, поставленных до остановки, и останавливает
+        писателя; оставшиеся за сигналом остановки получают WriteQueueStopped
+        """
+        if not self.running:
+            return
+        self._stopping = True
+        await self._queue.put(None)
+        await self._writer
+        self._writer = None
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None:
+                _set_exception(item[1], WriteQueueStopped("Очередь записи остановлена"))
+
+    async def submit(self, operation):
+        """Ставит операцию в очередь и ждёт её результата (после коммита); WriteQueueStopped - после остановки"""
+        if not self.running:
+            raise WriteQueueStopped("Очередь записи остановлена")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((operation, future))
+        return await future
+
+    def _drain(self, batch: list) -> bool:
+        """Добирает операции из очереди без ожидания; False - получен сигнал остановки"""
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return True
+            if item is None:
+                return False
+            batch.append(item)
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            running = self._drain(batch)
+            if running and len(batch) < self.max_batch and self.max_delay:
+                await asyncio.sleep(self.max_delay)
+                running = self._drain(batch)
+            await self._commit_batch(batch)
+            if not running:
+                return
+
+    async def _commit_batch(self, batch: list) -> None:
+        self.batches += 1
+        self.operations += len(batch)
+        results = []
+        try:
+            async with self.session_factory() as session:
+                for operation, future in batch:
+                    results.append(await operation(session))
+                await session.commit()
+        except Exception as exc:
+            if len(batch) == 1:
+                _set_exception(batch[0][1], exc)
+                return
+            for operation, future in batch:
+                await self._commit_single(operation, future)
+            return
+        for (operation, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _commit_single(self, operation, future) -> None:
+        try:
+            async with self.session_factory() as session:
+                result = await operation(session)
+                await session.commit()
+        except Exception as exc:
+            _set_exception(future, exc)
+            return
+        if not future.done():
+            future.set_result(result)
+
+
+def _set_exception(future, exc: Exception) -> None:
+    if not future.done():
+        future.set_exception(exc)
+
+
+# Групповой коммит включается TM_WRITE_QUEUE=1 (запускается в lifespan приложения)
+write_queue = (
+    WriteQueue(
+        AsyncSessionLocal,
+        max_batch=int(os.getenv("TM_WRITE_BATCH_SIZE", "64")),
+        max_delay=float(os.getenv("TM_WRITE_BATCH_DELAY_MS", "2")) / 1000,
+    )
+    if os.getenv("TM_WRITE_QUEUE", "").strip().lower() in ("1", "true", "yes", "on")
+    else None
+)
+
+
+async def get_write_db():
+    """Сессия для запросов с записью (пул писателя)"""
     async with AsyncSessionLocal() as session:
         try:
             yield session
@@ -83,19 +718,20 @@ async def get_db():
             await session.close()
 
 
-async def init_db():
-    """Инициализация базы данных"""
-    async with engine.begin() as conn:
-        # Создаём все таблицы через metadata (idempotent - не пересоздаёт существующие)
-        await conn.run_sync(Base.metadata.create_all)
-        
-        # Попытка миграции для существующих БД без user_id в tasks
-        # Используем прямой SQL запрос, чтобы проверить существование колонки
-        from sqlalchemy import text
+async def get_read_db():
+    """Сессия только для чтения (пул читателей)"""
+    async with AsyncReadSessionLocal() as session:
         try:
-            # Пытаемся добавить user_id, если его нет (SQLite не поддерживает IF NOT EXISTS для ALTER)
-            # Если колонка уже есть, получим ошибку, которую игнорируем
-            await conn.execute(text("ALTER TABLE tasks ADD COLUMN user_id VARCHAR"))
-        except Exception:
-            # Колонка уже существует или таблицы tasks нет - это нормально
-            pass
+            yield session
+        finally:
+            await session.close()
+
+
+# Прежнее имя зависимости: сессия с правом записи
+get_db = get_write_db
+
+
+async def init_db():
+    """Инициализация базы данных: применение недостающих миграций схемы"""
+    from app.backend.migrations import run_migrations
+    await run_migrations(engine)
@@ -0,0 +1,177 @@
+"""
+Лента изменений задач для подключённых клиентов (Server-Sent Events).
+
+TaskService после коммита публикует события created/updated/deleted в брокер,
+брокер раздаёт их подпискам с учётом доступа (админ видит всё, пользователь -
+только свои задачи, как в TaskService.get_task). У каждой подписки своя
+ограниченная очередь: если клиент не успевает читать и очередь переполнена,
+накопленные события отбрасываются и клиенту уходит одно событие resync -
+по нему клиент догружает состояние через /tasks/changes.
+
+Брокер по умолчанию работает внутри процесса (события видят только клиенты
+этого воркера). Его можно заменить через set_event_broker, например на
+реализацию поверх внешнего pub/sub.
+"""
+import asyncio
+import itertools
+import json
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Optional, Set
+
+from app.backend.auth import CurrentUser
+from app.backend.models import Task
+
+
+# Размер очереди одной подписки (сколько событий клиент может отстать)
+EVENTS_QUEUE_SIZE = int(os.getenv("TM_EVENTS_QUEUE_SIZE", "100"))
+# Интервал комментария-пинга в потоке (держит соединение через прокси)
+EVENTS_HEARTBEAT_S = float(os.getenv("TM_EVENTS_HEARTBEAT_S", "15"))
+
+EVENT_CREATED = "created"
+EVENT_UPDATED = "updated"
+EVENT_DELETED = "deleted"
+# Служебные события подписки
+EVENT_RESYNC = "resync"
+EVENT_CLOSE = "close"
+
+
+@dataclass
+class TaskEvent:
+    """Событие изменения задачи (task - None для удаления)"""
+    type: str
+    task_id: Optional[str]
+    user_id: Optional[str]
+    task: Optional[Task] = None
+    seq: int = 0
+
+    def payload(self) -> dict:
+        return {
+            "type": self.type,
+            "id": self.task_id,
+            "task": self.task.model_dump(mode="json") if self.task is not None else None,
+        }
+
+
+def is_visible(event: TaskEvent, user: CurrentUser) -> bool:
+    """Правило доступа то же, что у TaskService.get_task: админ или владелец"""
+    return user.role.value == "admin" or event.user_id == user.id
+
+
+class Subscription:
+    """Подписка одного клиента: очередь событий с отбрасыванием при переполнении"""
+
+    def __init__(self, user: CurrentUser, maxsize: int = EVENTS_QUEUE_SIZE):
+        self.user = user
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(2, maxsize))
+        self.dropped = 0
+
+    def put(self, event: TaskEvent) -> None:
+        try:
+            self.queue.put_nowait(event)
+            return
+        except asyncio.QueueFull:
+            pass
+        # Медленный клиент: выбрасываем всё накопленное, оставляем один resync
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.dropped += 1
+        self.queue.put_nowait(TaskEvent(EVENT_RESYNC, None, None, seq=event.seq))
+
+    def close(self) -> None:
+        """Завершение подписки: недоставленные события уже не нужны"""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(TaskEvent(EVENT_CLOSE, None, None))
+
+    async def get(self) -> TaskEvent:
+        return await self.queue.get()
+
+
+class EventBroker(ABC):
+    """Интерфейс брокера событий задач"""
+
+    @abstractmethod
+    def subscribe(self, user: CurrentUser) -> Subscription:
+        ...
+
+    @abstractmethod
+    def unsubscribe(self, subscription: Subscription) -> None:
+        ...
+
+    @abstractmethod
+    def publish(self, event: TaskEvent) -> None:
+        ...
+
+    @abstractmethod
+    def close(self) -> None:
+        """Завершает все подписки (при остановке приложения)"""
+
+
+class InProcessEventBroker(EventBroker):
+    """Брокер в памяти процесса"""
+
+    def __init__(self, queue_size: int = EVENTS_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.subscriptions: Set[Subscription] = set()
+        self._seq = itertools.count(1)
+
+    def subscribe(self, user: CurrentUser) -> Subscription:
+        subscription = Subscription(user, self.queue_size)
+        self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.subscriptions.discard(subscription)
+
+    def publish(self, event: TaskEvent) -> None:
+        event.seq = next(self._seq)
+        for subscription in list(self.subscriptions):
+            if is_visible(event, subscription.user):
+                subscription.put(event)
+
+    def close(self) -> None:
+        for subscription in list(self.subscriptions):
+            subscription.close()
+        self.subscriptions.clear()
+
+
+event_broker: EventBroker = InProcessEventBroker()
+
+
+def set_event_broker(broker: EventBroker) -> EventBroker:
+    """Подменяет брокер (возвращает прежний)"""
+    global event_broker
+    previous, event_broker = event_broker, broker
+    return previous
+
+
+def publish(event_type: str, task_id: str, user_id: Optional[str], task: Optional[Task] = None) -> None:
+    """Публикует событие в текущий брокер"""
+    event_broker.publish(TaskEvent(event_type, task_id, user_id, task))
+
+
+def _format_sse(event: TaskEvent) -> str:
+    data = json.dumps(event.payload(), ensure_ascii=False, separators=(",", ":"))
+    return f"id: {event.seq}\nevent: {event.type}\ndata: {data}\n\n"
+
+
+async def sse_stream(user: CurrentUser, heartbeat: float = EVENTS_HEARTBEAT_S):
+    """Поток text/event-stream для одного клиента; подписка снимается при отключении"""
+    broker = event_broker
+    subscription = broker.subscribe(user)
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if event.type == EVENT_CLOSE:
+                return
+            yield _format_sse(event)
+    finally:
+        broker.unsubscribe(subscription)
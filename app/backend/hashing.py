@@ -0,0 +1,127 @@
+"""
+Хэширование паролей (bcrypt) вне event loop.
+
+bcrypt с cost 12 занимает ~250 мс CPU, поэтому вызовы из async-обработчиков
+выполняются в отдельном пуле (потоки или процессы) с ограниченной очередью.
+Если пул и очередь заполнены, запрос сразу получает 429, а не ждёт.
+
+Настройки через окружение:
+    TM_HASH_POOL        - thread (по умолчанию) или process
+    TM_HASH_WORKERS     - размер пула (по умолчанию - число CPU)
+    TM_HASH_QUEUE_LIMIT - сколько задач может ждать свободного воркера (по умолчанию 4 * workers)
+"""
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+import bcrypt
+from fastapi import HTTPException
+
+BCRYPT_ROUNDS = 12
+
+
+def hash_password(password: str) -> str:
+    """
+    Хэширует пароль используя bcrypt.
+    Bcrypt ограничивает пароль 72 байтами, поэтому обрезаем при необходимости.
+    """
+    password_bytes = password.encode('utf-8')
+    # Bcrypt ограничивает пароль 72 байтами
+    if len(password_bytes) > 72:
+        password_bytes = password_bytes[:72]
+    
+    # Генерируем соль и хэшируем пароль
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+    hashed = bcrypt.hashpw(password_bytes, salt)
+    # Возвращаем как строку для хранения в БД
+    return hashed.decode('utf-8')
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """
+    Проверяет пароль против хэша.
+    """
+    try:
+        password_bytes = plain_password.encode('utf-8')
+        # Bcrypt ограничивает пароль 72 байтами
+        if len(password_bytes) > 72:
+            password_bytes = password_bytes[:72]
+        
+        hashed_bytes = hashed_password.encode('utf-8')
+        return bcrypt.checkpw(password_bytes, hashed_bytes)
+    except Exception:
+        return False
+
+
+class PasswordHasher:
+    """Ограниченный пул для hash_password/verify_password с отказом (429) при перегрузке"""
+
+    def __init__(self, kind: str = "thread", workers: Optional[int] = None, queue_limit: Optional[int] = None):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Неизвестный тип пула хэширования: {kind}")
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_limit = self.workers * 4 if queue_limit is None else queue_limit
+        self._executor: Optional[Executor] = None
+        # Задачи в работе + в очереди; считаем сами, т.к. у Executor нет ограничения очереди
+        self._in_flight = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls) -> "PasswordHasher":
+        workers = os.getenv("TM_HASH_WORKERS")
+        queue_limit = os.getenv("TM_HASH_QUEUE_LIMIT")
+        return cls(
+            kind=os.getenv("TM_HASH_POOL", "thread").strip().lower(),
+            workers=int(workers) if workers else None,
+            queue_limit=int(queue_limit) if queue_limit else None,
+        )
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """Сколько задач ждёт свободного воркера"""
+        return max(0, self._in_flight - self.workers)
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self._in_flight >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Сервер перегружен, повторите попытку позже",
+                headers={"Retry-After": "1"},
+            )
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def shutdown(self) -> None:
+        """Останавливает пул (при завершении приложения)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Глобальный пул хэширования паролей
+password_hasher = PasswordHasher.from_env()
@@ -0,0 +1,156 @@
+"""
+Шина инвалидации кэшей между воркерами.
+
+Изменения задач записывают ключи инвалидации task:<id> в таблицу
+cache_invalidations в той же транзакции, что и сами изменения.
+Свой воркер получает ключи сразу после коммита, остальные - опрашивая таблицу
+по возрастающему id (он же счётчик версии) раз в TM_INVALIDATION_POLL_MS.
+Кэши подписываются на префиксы ключей. Ключ "*" означает "сбросить всё" - его
+получают все подписчики, если воркер отстал дальше, чем хранится журнал.
+"""
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, List, Tuple
+
+from sqlalchemy import delete, event, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.backend.database import AsyncSessionLocal, AsyncReadSessionLocal, CacheInvalidationDB
+
+
+# Идентификатор процесса-воркера: свои записи из журнала повторно не применяем
+ORIGIN = uuid.uuid4().hex
+POLL_INTERVAL = float(os.getenv("TM_INVALIDATION_POLL_MS", "500")) / 1000
+# Сколько хранить записи журнала (воркер, отставший сильнее, сбрасывает кэши целиком)
+RETENTION = float(os.getenv("TM_INVALIDATION_RETENTION_S", "600"))
+RESET_KEY = "*"
+
+# Ключи сессии с инвалидациями, которые нужно разослать локально после коммита
+_PENDING = "pending_invalidations"
+
+
+def task_key(task_id: str) -> str:
+    """Изменилась конкретная задача"""
+    return f"task:{task_id}"
+
+
+class InvalidationBus:
+    """Подписки кэшей на ключи и опрос журнала cache_invalidations"""
+
+    def __init__(self, read_session_factory, write_session_factory,
+                 poll_interval: float = POLL_INTERVAL, retention: float = RETENTION):
+        self.read_session_factory = read_session_factory
+        self.write_session_factory = write_session_factory
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.last_id = 0
+        self.received = 0
+        self.resets = 0
+        self._subscribers: List[Tuple[str, Callable[[str], None]]] = []
+        self._task: asyncio.Task = None
+
+    def subscribe(self, prefix: str, callback: Callable[[str], None]) -> None:
+        """callback(key) вызывается для ключей с префиксом prefix и для RESET_KEY"""
+        self._subscribers.append((prefix, callback))
+
+    def dispatch(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            for prefix, callback in self._subscribers:
+                if key == RESET_KEY or key.startswith(prefix):
+                    callback(key)
+
+    async def record(self, session, keys: Iterable[str]) -> None:
+        """Записывает ключи в журнал в текущей транзакции сессии (без commit)"""
+        keys = sorted(set(keys))
+        if not keys:
+            return
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        await session.execute(
+            insert(CacheInvalidationDB.__table__),
+            [{"key": key, "origin": ORIGIN, "created_at": now} for key in keys],
+        )
+        session.info.setdefault(_PENDING, set()).update(keys)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        # История до старта не нужна: кэши воркера пока пусты
+        async with self.read_session_factory() as session:
+            self.last_id = (await session.execute(select(func.max(CacheInvalidationDB.id)))).scalar() or 0
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def poll(self) -> int:
+        """Один опрос журнала; возвращает число применённых чужих ключей"""
+        table = CacheInvalidationDB.__table__
+        async with self.read_session_factory() as session:
+            first_id = (await session.execute(select(func.min(table.c.id)))).scalar()
+            rows = (await session.execute(
+                select(table.c.id, table.c.key, table.c.origin)
+                .where(table.c.id > self.last_id)
+                .order_by(table.c.id)
+            )).all()
+        if first_id is not None and first_id > self.last_id + 1 and self.last_id > 0:
+            # Часть журнала уже удалена, а мы её не видели - сбрасываем всё
+            self.resets += 1
+            self.dispatch([RESET_KEY])
+        if not rows:
+            return 0
+        self.last_id = rows[-1].id
+        keys = {row.key for row in rows if row.origin != ORIGIN}
+        self.received += len(keys)
+        self.dispatch(keys)
+        return len(keys)
+
+    async def prune(self) -> None:
+        """Удаляет записи журнала старше retention"""
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=self.retention)
+        async with self.write_session_factory() as session:
+            await session.execute(delete(CacheInvalidationDB.__table__).where(CacheInvalidationDB.created_at < cutoff))
+            await session.commit()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_prune = loop.time() + self.retention / 10
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.poll()
+                if loop.time() >= next_prune:
+                    next_prune = loop.time() + self.retention / 10
+                    await self.prune()
+            except Exception as exc:
+                print(f"Ошибка опроса шины инвалидации: {exc!r}")
+
+    def stats(self) -> dict:
+        return {"last_id": self.last_id, "received": self.received, "resets": self.resets}
+
+
+invalidation_bus = InvalidationBus(AsyncReadSessionLocal, AsyncSessionLocal)
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_after_commit(session):
+    keys = session.info.pop(_PENDING, None)
+    if keys:
+        invalidation_bus.dispatch(keys)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop(_PENDING, None)
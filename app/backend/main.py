@@ -1,4 +1,4 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
@@ -7,8 +7,14 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from app.backend.routers import router
-from app.backend.database import init_db, AsyncSessionLocal
-from app.backend.auth import auth_router, ensure_admin
+from app.backend.database import init_db, AsyncSessionLocal, dispose_engines, engine_profile_info, write_queue
+from app.backend.auth import auth_router, ensure_admin, token_cache
+from app.backend.hashing import password_hasher
+from app.backend.middleware import ServerTimingMiddleware, MetricsMiddleware
+from app.backend.metrics import registry, loop_lag_monitor, CallbackMetric, CONTENT_TYPE
+from app.backend import events
+from app.backend.invalidation import invalidation_bus
+from app.backend.services import task_service
 
 
 @asynccontextmanager
@@ -19,9 +25,20 @@ async def lifespan(app: FastAPI):
     # Создание дефолтного администратора (dev)
     async with AsyncSessionLocal() as session:
         await ensure_admin(session)
+    if write_queue is not None:
+        await write_queue.start()
+    await invalidation_bus.start()
+    await loop_lag_monitor.start()
     print("База данных инициализирована")
     yield
     # Shutdown
+    await loop_lag_monitor.stop()
+    events.event_broker.close()
+    await invalidation_bus.stop()
+    if write_queue is not None:
+        await write_queue.stop()
+    password_hasher.shutdown()
+    await dispose_engines()
     print("Завершение работы приложения")
 
 
@@ -41,7 +58,12 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+# Число и время SQL-запросов в заголовке Server-Timing
+app.add_middleware(ServerTimingMiddleware)
+# Гистограммы времени запросов для /metrics (добавлен последним - внешний слой, видит и CORS)
+app.add_middleware(MetricsMiddleware)
 
 # Подключение роутов
 app.include_router(router)
@@ -58,10 +80,52 @@ async def root():
         "redoc": "/redoc"
     }
 
+def _cache_stats():
+    """Статистика кэшей: для /health и метрик tm_cache_*"""
+    return {"tasks": task_service.cache.stats(), "tokens": token_cache.stats()}
+
+
 @app.get("/health")
 async def health_check():
     """Проверка состояния приложения"""
-    return {"status": "healthy", "database": "SQLite"}
+    return {
+        "status": "healthy",
+        "database": "SQLite",
+        "engine": engine_profile_info(),
+        "caches": _cache_stats(),
+    }
+
+
+def _cache_metric(key: str):
+    """Сборщик значения key из stats() кэшей (у выключенного кэша stats() пустой)"""
+    return lambda: [((name,), stats[key]) for name, stats in _cache_stats().items() if key in stats]
+
+
+for _name, _key, _kind, _description in (
+    ("tm_cache_hits_total", "hits", "counter", "Попадания в кэш"),
+    ("tm_cache_misses_total", "misses", "counter", "Промахи кэша"),
+    ("tm_cache_hit_ratio", "hit_ratio", "gauge", "Доля попаданий в кэш"),
+    ("tm_cache_size", "size", "gauge", "Записей в кэше"),
+):
+    registry.register(CallbackMetric(_name, _description, _cache_metric(_key), ("cache",), _kind))
+registry.register(CallbackMetric(
+    "tm_password_hasher_queue_depth", "Операции bcrypt, ждущие свободного потока",
+    lambda: [((), password_hasher.queue_depth)],
+))
+registry.register(CallbackMetric(
+    "tm_password_hasher_in_flight", "Операции bcrypt в работе и в очереди",
+    lambda: [((), password_hasher.in_flight)],
+))
+registry.register(CallbackMetric(
+    "tm_password_hasher_rejected_total", "Операции bcrypt, отклонённые из-за переполнения очереди",
+    lambda: [((), password_hasher.rejected)], kind="counter",
+))
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики процесса в текстовом формате Prometheus"""
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
 
 if __name__ == "__main__":
     import uvicorn
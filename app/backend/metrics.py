@@ -0,0 +1,209 @@
+"""
+Метрики приложения в текстовом формате Prometheus (GET /metrics).
+
+Агрегация - в памяти процесса, без внешних зависимостей: счётчики и гистограммы
+с фиксированными корзинами обновляются в event loop без блокировок и аллокаций
+на горячем пути. Значения, которые уже хранят другие компоненты (кэши, пул
+хэширования), читаются в момент запроса /metrics функциями-сборщиками.
+У каждого процесса-воркера свои метрики: Prometheus опрашивает их по отдельности.
+"""
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Корзины гистограмм, с
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+# Период замера задержки event loop
+LOOP_LAG_INTERVAL = float(os.getenv("TM_LOOP_LAG_INTERVAL_MS", "500")) / 1000
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _series(name: str, label_names: Labels, label_values: Labels, extra: str = "") -> str:
+    pairs = [f'{label}="{_escape(str(value))}"' for label, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return f"{name}{{{','.join(pairs)}}}" if pairs else name
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    """Базовая метрика: имя, описание, имена меток"""
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str, labels: Labels = ()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+
+    @abstractmethod
+    def samples(self) -> Iterable[Tuple[str, float]]:
+        """Пары (ряд с метками, значение) для экспозиции"""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{series} {_number(value)}" for series, value in self.samples())
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labels: Labels = ()):
+        super().__init__(name, description, labels)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        for label_values, value in self.values.items():
+            yield _series(self.name, self.labels, label_values), value
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str):
+        super().__init__(name, description)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def samples(self):
+        yield self.name, self.value
+
+
+class Histogram(Metric):
+    """Гистограмма с фиксированными корзинами: по ряду - счётчики корзин (не накопительные) и сумма"""
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labels: Labels = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+        self.series: Dict[Labels, list] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        series = self.series.get(label_values)
+        if series is None:
+            series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self):
+        bounds = self.buckets + (float("inf"),)
+        for label_values, (counts, total) in self.series.items():
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                yield _series(f"{self.name}_bucket", self.labels, label_values, f'le="{_number(bound)}"'), cumulative
+            yield _series(f"{self.name}_sum", self.labels, label_values), total
+            yield _series(f"{self.name}_count", self.labels, label_values), cumulative
+
+
+class CallbackMetric(Metric):
+    """Значения читаются при сборке: collect() -> [(значения меток, число), ...]"""
+
+    def __init__(self, name: str, description: str, collect: Callable[[], Iterable[Tuple[Labels, float]]],
+                 labels: Labels = (), kind: str = "gauge"):
+        super().__init__(name, description, labels)
+        self.kind = kind
+        self.collect = collect
+
+    def samples(self):
+        for label_values, value in self.collect():
+            yield _series(self.name, self.labels, label_values), value
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception as exc:
+                # Сломанный сборщик не должен ронять весь /metrics
+                print(f"Ошибка сборки метрики {metric.name}: {exc!r}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.register(Histogram(
+    "tm_http_request_duration_seconds",
+    "Время обработки HTTP-запроса по шаблону маршрута и статусу (_count - число запросов)",
+    ("method", "route", "status"),
+))
+http_requests_in_progress = registry.register(Gauge("tm_http_requests_in_progress", "HTTP-запросы в обработке"))
+db_pool_checkout_wait = registry.register(Histogram(
+    "tm_db_pool_checkout_wait_seconds", "Ожидание соединения из пула БД", ("pool",), POOL_WAIT_BUCKETS,
+))
+event_loop_lag = registry.register(Histogram(
+    "tm_event_loop_lag_seconds", "Задержка срабатывания таймера event loop", (), LOOP_LAG_BUCKETS,
+))
+
+
+class EventLoopLagMonitor:
+    """Фоновая задача: спит interval и замеряет, насколько позже её разбудил event loop"""
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL):
+        self.interval = interval
+        self.last_lag = 0.0
+        self._task: asyncio.Task = None
+
+    async def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(0.0, loop.time() - expected)
+            event_loop_lag.observe(self.last_lag)
+
+
+loop_lag_monitor = EventLoopLagMonitor()
+registry.register(CallbackMetric(
+    "tm_event_loop_lag_last_seconds", "Последний замер задержки event loop", lambda: [((), loop_lag_monitor.last_lag)],
+))
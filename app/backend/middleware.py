@@ -0,0 +1,84 @@
+"""
+ASGI middleware приложения.
+
+ServerTimingMiddleware заводит на каждый HTTP-запрос счётчик SQL-запросов
+(database.query_stats) и отдаёт итоги в заголовке Server-Timing:
+db - суммарное время SQL и число запросов, app - время до начала ответа.
+Учитываются запросы, выполненные до отправки заголовков (тело потоковых ответов
+и операции очереди группового коммита - нет).
+
+MetricsMiddleware пишет в гистограмму tm_http_request_duration_seconds время
+каждого запроса (до конца тела ответа) по шаблону маршрута, а не по пути:
+/api/v1/tasks/{task_id} - один ряд на все задачи.
+"""
+import time
+
+from app.backend import metrics
+from app.backend.database import QueryStats, query_stats
+
+
+class ServerTimingMiddleware:
+    """Чистый ASGI middleware (без BaseHTTPMiddleware: не создаёт лишних задач)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = query_stats.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                elapsed = (time.perf_counter() - started) * 1000
+                value = f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries", app;dur={elapsed:.1f}'
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"server-timing", value.encode("latin-1")),
+                    # Без него браузер не покажет Server-Timing для запросов с другого origin
+                    (b"timing-allow-origin", b"*"),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            query_stats.reset(token)
+
+
+class MetricsMiddleware:
+    """Чистый ASGI middleware: метрики числа и длительности HTTP-запросов"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Если приложение упадёт до начала ответа, клиент получит 500
+        status = 500
+        started = time.perf_counter()
+        metrics.http_requests_in_progress.inc()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.http_requests_in_progress.dec()
+            # Маршрут проставляет роутер FastAPI; без него (404, статика) - один общий ряд
+            route = scope.get("route")
+            metrics.http_request_duration.observe(
+                time.perf_counter() - started,
+                scope["method"], getattr(route, "path", "unmatched"), str(status),
+            )
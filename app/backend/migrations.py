@@ -0,0 +1,158 @@
+"""
+Версионированные миграции схемы БД.
+
+Текущая версия схемы хранится в таблице schema_version. При старте init_db
+сравнивает её с последней версией из MIGRATIONS и, если схема актуальна,
+ничего не делает. Иначе недостающие миграции применяются по порядку в одной
+транзакции. Уже выпущенные миграции не меняем - только добавляем новые в конец.
+"""
+from sqlalchemy import inspect, text
+
+from app.backend.database import (
+    Base, UserDB, TaskDB, TaskCounterDB, DeletedTaskDB, CacheInvalidationDB,
+    IS_SQLITE, PRIORITY_RANK_SQL, TASK_COUNTERS_TRIGGERS, TASKS_FTS_DDL, TASK_TOMBSTONE_TRIGGERS, TASK_VERSION_TRIGGERS,
+    rebuild_task_counters, rebuild_search_index,
+)
+
+
+def _create_task_indexes(sync_conn) -> None:
+    """
+    Недостающие индексы TaskDB. Индексы по колонкам, которые добавит более поздняя
+    миграция, пропускаются - их создаст она сама.
+    """
+    existing = {column["name"] for column in inspect(sync_conn).get_columns("tasks")}
+    for index in TaskDB.__table__.indexes:
+        if all(column.name in existing for column in index.columns):
+            index.create(sync_conn, checkfirst=True)
+
+
+async def _m001_base_schema(conn):
+    """Базовые таблицы users/tasks (+ колонка user_id для БД до введения авторизации)"""
+    await conn.run_sync(Base.metadata.create_all, tables=[UserDB.__table__, TaskDB.__table__])
+    columns = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_columns("tasks"))
+    if "user_id" not in {column["name"] for column in columns}:
+        await conn.execute(text("ALTER TABLE tasks ADD COLUMN user_id VARCHAR"))
+
+
+async def _m002_task_counters(conn):
+    """Таблица счётчиков статистики и триггеры, поддерживающие её"""
+    await conn.run_sync(Base.metadata.create_all, tables=[TaskCounterDB.__table__])
+    if IS_SQLITE:
+        for statement in TASK_COUNTERS_TRIGGERS:
+            await conn.execute(text(statement))
+        await rebuild_task_counters(conn)
+
+
+async def _m003_task_indexes(conn):
+    """Составные индексы tasks под пути доступа списка задач и статистики"""
+    await conn.run_sync(_create_task_indexes)
+
+
+async def _m004_tasks_fts(conn):
+    """Полнотекстовый индекс tasks_fts (FTS5) и триггеры синхронизации с tasks"""
+    if IS_SQLITE:
+        for statement in TASKS_FTS_DDL:
+            await conn.execute(text(statement))
+        await rebuild_search_index(conn)
+
+
+async def _m005_task_changes(conn):
+    """Индекс tasks(updated_at) и журнал удалённых задач для дельта-синхронизации"""
+    def create_schema(sync_conn):
+        _create_task_indexes(sync_conn)
+        Base.metadata.create_all(sync_conn, tables=[DeletedTaskDB.__table__])
+    await conn.run_sync(create_schema)
+    if IS_SQLITE:
+        for statement in TASK_TOMBSTONE_TRIGGERS:
+            await conn.execute(text(statement))
+
+
+async def _m006_cache_invalidations(conn):
+    """Журнал ключей инвалидации кэшей между воркерами"""
+    await conn.run_sync(Base.metadata.create_all, tables=[CacheInvalidationDB.__table__])
+
+
+async def _m007_task_versions(conn):
+    """Колонка task_counters.version и триггеры, увеличивающие её при изменении задач"""
+    columns = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_columns("task_counters"))
+    if "version" not in {column["name"] for column in columns}:
+        await conn.execute(text("ALTER TABLE task_counters ADD COLUMN version INTEGER NOT NULL DEFAULT 0"))
+    if IS_SQLITE:
+        for statement in TASK_VERSION_TRIGGERS:
+            await conn.execute(text(statement))
+
+
+async def _m008_open_deadline_indexes(conn):
+    """Частичные индексы tasks(deadline) по незавершённым задачам (счётчик просроченных)"""
+    await conn.run_sync(_create_task_indexes)
+
+
+async def _m009_sort_indexes(conn):
+    """
+    Индексы сортировки по статусу и приоритету в порядке курсора (ключ, id):
+    ix_tasks_user_status (user_id, status, updated_at) заменяется на (user_id, status, id),
+    для приоритета - вычисляемая колонка priority_rank
+    """
+    columns = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_columns("tasks"))
+    if "priority_rank" not in {column["name"] for column in columns}:
+        # SQLite добавляет через ALTER TABLE только VIRTUAL-колонки, остальные СУБД - только STORED
+        storage = "VIRTUAL" if IS_SQLITE else "STORED"
+        await conn.execute(text(
+            f"ALTER TABLE tasks ADD COLUMN priority_rank INTEGER GENERATED ALWAYS AS ({PRIORITY_RANK_SQL}) {storage}"
+        ))
+    await conn.execute(text("DROP INDEX IF EXISTS ix_tasks_user_status"))
+    await conn.run_sync(_create_task_indexes)
+
+
+# (версия, описание, функция миграции)
+MIGRATIONS = (
+    (1, "базовая схема", _m001_base_schema),
+    (2, "счётчики статистики task_counters", _m002_task_counters),
+    (3, "индексы таблицы tasks", _m003_task_indexes),
+    (4, "полнотекстовый поиск tasks_fts", _m004_tasks_fts),
+    (5, "журнал изменений задач", _m005_task_changes),
+    (6, "шина инвалидации кэшей", _m006_cache_invalidations),
+    (7, "версии наборов задач для ETag", _m007_task_versions),
+    (8, "частичные индексы незавершённых задач", _m008_open_deadline_indexes),
+    (9, "индексы сортировки по статусу и приоритету", _m009_sort_indexes),
+)
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+async def get_schema_version(conn) -> int:
+    """Текущая версия схемы (0 - миграции ещё не применялись)"""
+    has_table = await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table("schema_version"))
+    if not has_table:
+        return 0
+    res = await conn.execute(text("SELECT version FROM schema_version WHERE id = 1"))
+    return res.scalar() or 0
+
+
+async def run_migrations(engine) -> int:
+    """Применяет недостающие миграции; возвращает итоговую версию схемы"""
+    # Быстрый путь: схема актуальна - никаких DDL и блокировок на запись
+    async with engine.connect() as conn:
+        if await get_schema_version(conn) >= LATEST_VERSION:
+            return LATEST_VERSION
+
+    async with engine.begin() as conn:
+        await conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_version (id INTEGER PRIMARY KEY, version INTEGER NOT NULL)"
+        ))
+        await conn.execute(text(
+            "INSERT INTO schema_version (id, version) SELECT 1, 0 "
+            "WHERE NOT EXISTS (SELECT 1 FROM schema_version WHERE id = 1)"
+        ))
+        # Берём блокировку на запись до чтения версии, чтобы параллельно
+        # стартующие воркеры не применяли одни и те же миграции дважды
+        await conn.execute(text("UPDATE schema_version SET version = version WHERE id = 1"))
+        current = await get_schema_version(conn)
+
+        for version, description, migrate in MIGRATIONS:
+            if version <= current:
+                continue
+            await migrate(conn)
+            await conn.execute(text("UPDATE schema_version SET version = :version WHERE id = 1"), {"version": version})
+            print(f"Применена миграция {version}: {description}")
+            current = version
+    return current
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, TypeAdapter
+from typing import List, Optional
+from typing_extensions import TypedDict
 from enum import Enum
 import uuid
 from datetime import datetime, timezone
@@ -48,6 +49,120 @@ class Task(TaskBase):
     class Config:
         from_attributes = True
 
+# Максимум элементов в одном запросе массовых операций
+BULK_MAX_ITEMS = 5000
+
+
+class TaskBulkCreate(BaseModel):
+    """Массовое создание задач"""
+    items: List[TaskCreate] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+
+
+class TaskBulkUpdateItem(TaskUpdate):
+    """Элемент массового обновления: id задачи и изменяемые поля"""
+    id: str
+
+
+class TaskBulkUpdate(BaseModel):
+    """Массовое обновление задач"""
+    items: List[TaskBulkUpdateItem] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+
+
+class TaskBulkDelete(BaseModel):
+    """Массовое удаление задач"""
+    ids: List[str] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+
+
+class BulkItemResult(BaseModel):
+    """Результат массовой операции для одного элемента (index - позиция в запросе)"""
+    index: int
+    id: Optional[str] = None
+    ok: bool
+    error: Optional[str] = None
+    task: Optional[Task] = None
+
+
+class TaskImportError(BaseModel):
+    """Ошибка в строке импорта"""
+    line: int = Field(..., description="Номер строки NDJSON (с 1)")
+    error: str
+
+
+class TaskImportResult(BaseModel):
+    """Итог импорта задач"""
+    imported: int
+    failed: int
+    errors: List[TaskImportError] = Field(..., description="Ошибки по строкам (первые 100)")
+
+
+class TaskPage(BaseModel):
+    """Страница списка задач"""
+    items: List[Task]
+    next_cursor: Optional[str] = Field(None, description="Курсор следующей страницы (null - страниц больше нет)")
+
+class TaskChanges(BaseModel):
+    """Страница изменений задач после водяной отметки since"""
+    changed: List[Task] = Field(..., description="Созданные или изменённые задачи")
+    deleted: List[str] = Field(..., description="id удалённых задач (только на первой странице)")
+    watermark: datetime = Field(..., description="Передать как since в следующем запросе (одна на все страницы)")
+    next_cursor: Optional[str] = Field(None, description="Курсор следующей страницы (null - страниц больше нет)")
+    resync: bool = Field(False, description="since старше срока хранения журнала удалений - нужен полный снимок")
+
+# Быстрый путь чтения списков: строки задач отдаются словарями без построения
+# моделей Task и сериализуются сразу в JSON. Поля и их порядок - как у моделей
+# выше, поэтому JSON совпадает с ответом через response_model байт в байт.
+class TaskRow(TypedDict):
+    """Задача в виде словаря (поля Task)"""
+    title: str
+    description: Optional[str]
+    status: TaskStatus
+    priority: Priority
+    deadline: Optional[datetime]
+    id: str
+    created_at: datetime
+    updated_at: datetime
+
+
+class TaskPartialRow(TypedDict, total=False):
+    """Задача, сокращённая до запрошенных полей (fields=)"""
+    title: str
+    description: Optional[str]
+    status: TaskStatus
+    priority: Priority
+    deadline: Optional[datetime]
+    id: str
+    created_at: datetime
+    updated_at: datetime
+
+
+class TaskPageRows(TypedDict):
+    """TaskPage со строками-словарями"""
+    items: List[TaskRow]
+    next_cursor: Optional[str]
+
+
+class TaskPartialPageRows(TypedDict):
+    """TaskPage с сокращёнными строками"""
+    items: List[TaskPartialRow]
+    next_cursor: Optional[str]
+
+
+class TaskChangesRows(TypedDict):
+    """TaskChanges со строками-словарями"""
+    changed: List[TaskRow]
+    deleted: List[str]
+    watermark: datetime
+    next_cursor: Optional[str]
+    resync: bool
+
+
+# Сериализаторы строятся один раз при импорте
+TASK_ROW_JSON = TypeAdapter(TaskRow)
+TASK_PAGE_JSON = TypeAdapter(TaskPageRows)
+TASK_PARTIAL_PAGE_JSON = TypeAdapter(TaskPartialPageRows)
+TASK_CHANGES_JSON = TypeAdapter(TaskChangesRows)
+
+
 class TaskStatistics(BaseModel):
     """Модель статистики задач"""
     total: int
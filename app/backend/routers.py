@@ -1,44 +1,219 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
+import hashlib
+from fastapi import APIRouter, HTTPException, Query, Depends, Header, Request, Response
+from fastapi.responses import StreamingResponse
+from datetime import datetime, timezone
 from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.backend.models import Task, TaskCreate, TaskUpdate, TaskStatus, TaskStatistics
-from app.backend.services import task_service
-from app.backend.database import get_db
-from app.backend.auth import get_current_user, require_admin, CurrentUser
+from app.backend.models import (
+    Task, TaskCreate, TaskUpdate, TaskStatus, TaskStatistics, TaskPage, TaskChanges,
+    TaskBulkCreate, TaskBulkUpdate, TaskBulkDelete, BulkItemResult, TaskImportResult,
+)
+from app.backend.services import task_service, EXPORT_FORMATS, CHANGES_PAGE_SIZE
+from app.backend.database import get_read_db, get_write_db
+from app.backend.auth import get_current_user, get_stream_user, require_admin, CurrentUser
+from app.backend import events
 
 router = APIRouter(prefix="/api/v1/tasks", tags=["tasks"])
 
+# Ответ можно хранить в кэше браузера, но перед использованием - перепроверять по ETag
+_REVALIDATE = "private, no-cache"
+
+
+def _etag(*parts) -> str:
+    """Сильный ETag из версии данных и параметров запроса (тело ответа не хэшируется)"""
+    raw = "|".join("" if part is None else str(part) for part in parts)
+    return '"' + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def _conditional(response: Response, if_none_match: Optional[str], etag: Optional[str]) -> Optional[Response]:
+    """Проставляет ETag; если у клиента та же версия - возвращает готовый ответ 304"""
+    if etag is None:
+        return None
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": _REVALIDATE})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = _REVALIDATE
+    return None
+
+
+def _json(body: bytes, response: Response) -> Response:
+    """Готовый JSON (быстрый путь сериализации) с заголовками, проставленными в response"""
+    return Response(content=body, media_type="application/json", headers=dict(response.headers))
+
+
+_FIELDS_DESCRIPTION = "Вернуть только эти поля задачи, через запятую (например id,title,status,deadline)"
+
+
+def _fields(fields: Optional[str]):
+    """Разбор fields= (400 при неизвестном поле)"""
+    try:
+        return task_service.parse_fields(fields)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+def _scope(current_user: CurrentUser) -> str:
+    """Чьи задачи видит пользователь: админ - все"""
+    return "*" if current_user.role.value == "admin" else current_user.id
+
 
 @router.post("/", response_model=Task, status_code=201)
-async def create_task(task: TaskCreate, db: AsyncSession = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
+async def create_task(task: TaskCreate, db: AsyncSession = Depends(get_write_db), current_user: CurrentUser = Depends(get_current_user)):
     """Создание новой задачи"""
     return await task_service.create_task(db, task, current_user)
 
 
+# Массовые операции объявлены до /{task_id}, иначе "bulk" совпадёт с task_id
+@router.post("/bulk", response_model=List[BulkItemResult])
+async def create_tasks_bulk(payload: TaskBulkCreate, db: AsyncSession = Depends(get_write_db), current_user: CurrentUser = Depends(get_current_user)):
+    """Массовое создание задач"""
+    return await task_service.create_tasks(db, payload.items, current_user)
+
+
+@router.patch("/bulk", response_model=List[BulkItemResult])
+async def update_tasks_bulk(payload: TaskBulkUpdate, db: AsyncSession = Depends(get_write_db), current_user: CurrentUser = Depends(get_current_user)):
+    """Массовое обновление задач (результат по каждому элементу)"""
+    return await task_service.update_tasks(db, payload.items, current_user)
+
+
+@router.delete("/bulk", response_model=List[BulkItemResult])
+async def delete_tasks_bulk(payload: TaskBulkDelete, db: AsyncSession = Depends(get_write_db), current_user: CurrentUser = Depends(get_current_user)):
+    """Массовое удаление задач (результат по каждому элементу)"""
+    return await task_service.delete_tasks(db, payload.ids, current_user)
+
+
+@router.post(
+    "/import",
+    response_model=TaskImportResult,
+    openapi_extra={"requestBody": {"required": True, "content": {"application/x-ndjson": {"schema": {"type": "string"}}}}},
+)
+async def import_tasks(request: Request, db: AsyncSession = Depends(get_write_db), current_user: CurrentUser = Depends(get_current_user)):
+    """Импорт задач из NDJSON (по TaskCreate в строке); тело читается потоком, ошибки - по строкам"""
+    return await task_service.import_tasks(db, request.stream(), current_user)
+
+
+@router.get("/changes", response_model=TaskChanges)
+async def get_task_changes(
+    since: Optional[datetime] = Query(None, description="watermark из предыдущего ответа (без него - полный снимок)"),
+    limit: int = Query(CHANGES_PAGE_SIZE, ge=1, le=CHANGES_PAGE_SIZE, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (next_cursor из предыдущего ответа)"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Дельта-синхронизация: задачи, изменённые после since, и id удалённых (постранично)"""
+    try:
+        body = await task_service.get_changes_json(db, since, current_user, limit, cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return Response(content=body, media_type="application/json")
+
+
+@router.get("/events")
+async def task_events(current_user: CurrentUser = Depends(get_stream_user)):
+    """
+    Лента изменений задач (Server-Sent Events): created/updated/deleted,
+    resync - клиент отстал, события пропущены, нужна синхронизация через /changes.
+    Токен можно передать в ?access_token= (EventSource не поддерживает заголовки).
+    """
+    return StreamingResponse(
+        events.sse_stream(current_user),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+_EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+@router.get("/export")
+async def export_tasks(
+    export_format: str = Query("ndjson", alias="format", pattern=f"^({'|'.join(EXPORT_FORMATS)})$", description="Формат: ndjson или csv"),
+    status: Optional[TaskStatus] = Query(None, description="Фильтр по статусу"),
+    search: Optional[str] = Query(None, description="Поиск по названию и описанию"),
+    sort_by: Optional[str] = Query(None, description="Сортировка: created_at, updated_at, status, priority, deadline"),
+    sort_order: Optional[str] = Query("asc", description="Порядок сортировки: asc или desc"),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Потоковая выгрузка всех задач (для админа - всех пользователей) с фильтрами списка"""
+    return StreamingResponse(
+        task_service.export_tasks(export_format, status, search, sort_by, sort_order, current_user),
+        media_type=_EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="tasks.{export_format}"'},
+    )
+
+
 @router.get("/{task_id}", response_model=Task)
-async def get_task(task_id: str, db: AsyncSession = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
-    """Получение задачи по ID"""
+async def get_task(
+    task_id: str,
+    response: Response,
+    fields: Optional[str] = Query(None, description=_FIELDS_DESCRIPTION),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Получение задачи по ID (ETag - по updated_at задачи).
+    Задача берётся из кэша целиком, fields сокращает только ответ.
+    """
+    projection = _fields(fields)
     task = await task_service.get_task(db, task_id, current_user)
     if not task:
         raise HTTPException(status_code=404, detail="Задача не найдена")
-    return task
+    etag = _etag("task", task.id, task.updated_at.isoformat(), projection and ",".join(projection))
+    not_modified = _conditional(response, if_none_match, etag)
+    if not_modified:
+        return not_modified
+    if projection is None:
+        return task
+    return _json(task.model_dump_json(include=set(projection)).encode("utf-8"), response)
 
 
-@router.get("/", response_model=List[Task])
+@router.get("/", response_model=TaskPage)
 async def get_tasks(
+    response: Response,
     status: Optional[TaskStatus] = Query(None, description="Фильтр по статусу"),
     search: Optional[str] = Query(None, description="Поиск по названию и описанию"),
     sort_by: Optional[str] = Query(None, description="Сортировка: created_at, updated_at, status, priority, deadline"),
     sort_order: Optional[str] = Query("asc", description="Порядок сортировки: asc или desc"),
-    db: AsyncSession = Depends(get_db),
+    limit: int = Query(100, ge=1, le=1000, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (next_cursor из предыдущего ответа)"),
+    fields: Optional[str] = Query(None, description=_FIELDS_DESCRIPTION),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db),
     current_user: CurrentUser = Depends(get_current_user)
 ):
-    """Получение списка задач"""
-    return await task_service.get_tasks(db, status, search, sort_by, sort_order, current_user)
+    """
+    Получение страницы списка задач (ETag - по версии набора задач и параметрам запроса).
+    JSON собирается в сервисе из строк без моделей Task; response_model - для схемы OpenAPI.
+    С fields из БД читаются и в ответ попадают только перечисленные поля.
+    """
+    projection = _fields(fields)
+    version = await task_service.get_change_version(db, current_user)
+    if version is not None:
+        etag = _etag(
+            "list", _scope(current_user), version, status, search, sort_by, sort_order, limit, cursor,
+            projection and ",".join(projection),
+        )
+        not_modified = _conditional(response, if_none_match, etag)
+        if not_modified:
+            return not_modified
+    try:
+        body = await task_service.get_tasks_json(db, status, search, sort_by, sort_order, current_user, limit, cursor, projection)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return _json(body, response)
 
 
 @router.put("/{task_id}", response_model=Task)
-async def update_task(task_id: str, task_update: TaskUpdate, db: AsyncSession = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
+async def update_task(task_id: str, task_update: TaskUpdate, db: AsyncSession = Depends(get_write_db), current_user: CurrentUser = Depends(get_current_user)):
     """Обновление задачи"""
     task = await task_service.update_task(db, task_id, task_update, current_user)
     if not task:
@@ -47,13 +222,27 @@ async def update_task(task_id: str, task_update: TaskUpdate, db: AsyncSession =
 
 
 @router.delete("/{task_id}", status_code=204)
-async def delete_task(task_id: str, db: AsyncSession = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
+async def delete_task(task_id: str, db: AsyncSession = Depends(get_write_db), current_user: CurrentUser = Depends(get_current_user)):
     """Удаление задачи"""
     if not await task_service.delete_task(db, task_id, current_user):
         raise HTTPException(status_code=404, detail="Задача не найдена")
     return None
 
 @router.get("/statistics/summary", response_model=TaskStatistics)
-async def get_statistics(db: AsyncSession = Depends(get_db)):
-    """Получение статистики задач"""
-    return await task_service.get_statistics(db)
\ No newline at end of file
+async def get_statistics(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Получение статистики задач (для админа - по всем задачам, для пользователя - по своим).
+    ETag - по версии набора задач и текущей дате (overdue и completed_today зависят от дня).
+    """
+    version = await task_service.get_change_version(db, current_user)
+    if version is not None:
+        today = datetime.now(timezone.utc).date()
+        not_modified = _conditional(response, if_none_match, _etag("statistics", _scope(current_user), version, today))
+        if not_modified:
+            return not_modified
+    return await task_service.get_statistics(db, current_user)
\ No newline at end of file
@@ -1,99 +1,334 @@
-from typing import List, Optional
-from datetime import datetime, timezone, date
+import base64
+import csv
+import io
+import json
+import os
+import re
+import uuid
+from time import monotonic
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+from datetime import datetime, timezone, timedelta, time
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete, or_, and_
-from app.backend.models import Task, TaskCreate, TaskUpdate, TaskStatus, Priority, TaskStatistics
-from app.backend.database import TaskDB, TaskStatusEnum, PriorityEnum
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import select, update, delete, insert, or_, and_, case, func, literal, literal_column, bindparam, text, tuple_
+from app.backend.models import (
+    Task, TaskCreate, TaskUpdate, TaskStatus, Priority, TaskStatistics, TaskPage,
+    TaskBulkUpdateItem, BulkItemResult, TaskImportError, TaskImportResult, TaskRow, TASK_ROW_JSON, TASK_PAGE_JSON, TASK_PARTIAL_PAGE_JSON, TASK_CHANGES_JSON,
+)
+from app.backend.database import (
+    TaskDB, TaskCounterDB, DeletedTaskDB, TaskStatusEnum, PriorityEnum, tasks_fts, OPEN_TASK_SQL,
+    IS_SQLITE, GLOBAL_COUNTERS_KEY, COUNTER_FIELDS, rebuild_task_counters, write_queue, WriteQueueStopped, AsyncReadSessionLocal,
+)
 from app.backend.auth import CurrentUser
+from app.backend import events
+from app.backend.invalidation import invalidation_bus, task_key, RESET_KEY
+from app.backend.cache import CacheBackend, LocalCacheBackend
+
+T = TypeVar("T")
+
+
+# Допустимые значения sort_by для списка задач
+SORT_FIELDS = ("created_at", "updated_at", "status", "priority", "deadline")
+
+# Соответствие enum API и enum БД (члены называются одинаково)
+_STATUS_TO_DB = {status: TaskStatusEnum[status.name] for status in TaskStatus}
+_STATUS_FROM_DB = {db_status: TaskStatus[db_status.name] for db_status in TaskStatusEnum}
+_PRIORITY_TO_DB = {priority: PriorityEnum[priority.name] for priority in Priority}
+_PRIORITY_FROM_DB = {db_priority: Priority[db_priority.name] for db_priority in PriorityEnum}
+
+# Колонки задачи для чтения через Core (без ORM-объектов) - в порядке полей Task
+_TASK_COLUMNS = tuple(
+    TaskDB.__table__.c[name]
+    for name in ("title", "description", "status", "priority", "deadline", "id", "created_at", "updated_at")
+)
+_TASK_COLUMN_BY_NAME = {column.name: column for column in _TASK_COLUMNS}
+
+# Поля задачи, которые можно запросить через fields= (в порядке полей Task)
+TASK_FIELDS = tuple(Task.model_fields)
+
+# Вес приоритета для сортировки (высокий > средний > низкий), как в колонке tasks.priority_rank
+_PRIORITY_RANK = {PriorityEnum.HIGH: 3, PriorityEnum.MEDIUM: 2, PriorityEnum.LOW: 1}
+
+# Отставание водяной отметки /tasks/changes от текущего времени: updated_at
+# проставляется до коммита, и запись, закоммиченная чуть позже параллельной,
+# не должна оказаться "в прошлом" относительно уже выданной отметки
+CHANGES_SAFETY_WINDOW = timedelta(seconds=5)
+# Размер страницы /tasks/changes по умолчанию (и наибольший)
+CHANGES_PAGE_SIZE = 1000
+# Сколько хранится журнал удалений deleted_tasks: since старше - только полный снимок (resync)
+TOMBSTONE_RETENTION = timedelta(days=float(os.getenv("TM_TOMBSTONE_RETENTION_DAYS", "30")))
+# Как часто операции удаления заодно чистят устаревший журнал удалений (в каждом воркере)
+TOMBSTONE_PRUNE_INTERVAL_S = 3600
+
+# Кэш чтения отдельных задач (0 - выключить) и срок жизни записи
+TASK_CACHE_SIZE = int(os.getenv("TM_TASK_CACHE_SIZE", "10000"))
+TASK_CACHE_TTL_S = float(os.getenv("TM_TASK_CACHE_TTL_S", "300"))
+
+# Экспорт: форматы и число строк, читаемых из курсора БД и отдаваемых клиенту за раз
+EXPORT_FORMATS = ("ndjson", "csv")
+EXPORT_CHUNK_SIZE = int(os.getenv("TM_EXPORT_CHUNK_SIZE", "1000"))
+
+# Импорт: задач в одной транзакции, предел длины строки NDJSON и число ошибок в ответе
+IMPORT_BATCH_SIZE = int(os.getenv("TM_IMPORT_BATCH_SIZE", "1000"))
+IMPORT_MAX_LINE_BYTES = 64 * 1024
+IMPORT_MAX_ERRORS = 100
 
 
 class TaskService:
     """Сервис для управления задачами с использованием SQLite"""
     
-    def __init__(self):
-        pass
-    
-    
+    def __init__(self, cache: Optional[CacheBackend] = None):
+        # Кэш get_task: task_id -> (user_id, Task); владелец нужен для проверки доступа
+        self.cache = cache if cache is not None else LocalCacheBackend(TASK_CACHE_SIZE, TASK_CACHE_TTL_S)
+        # Растёт при каждой инвалидации: чтение, начатое до неё, не кладёт строку в кэш
+        self._cache_generation = 0
+        # Время (monotonic) последней чистки журнала удалений
+        self._tombstones_pruned_at: Optional[float] = None
+
+    def set_cache(self, cache: CacheBackend) -> None:
+        """Подмена хранилища кэша задач (например, на внешнее)"""
+        self.cache = cache
+        self._cache_generation += 1
+
+    def _on_invalidate(self, key: str) -> None:
+        """Подписчик шины инвалидации: ключи task:<id> и сброс всего"""
+        self._cache_generation += 1
+        if key == RESET_KEY:
+            self.cache.discard_all()
+        else:
+            self.cache.discard(key.split(":", 1)[1])
+
 
     def _status_to_enum(self, status: TaskStatus) -> TaskStatusEnum:
         """Конвертация статуса из Pydantic в SQLAlchemy enum"""
-        mapping = {
-            TaskStatus.CREATED: TaskStatusEnum.CREATED,
-            TaskStatus.IN_PROGRESS: TaskStatusEnum.IN_PROGRESS,
-            TaskStatus.COMPLETED: TaskStatusEnum.COMPLETED
-        }
-        return mapping[status]
+        return _STATUS_TO_DB[status]
     
     def _enum_to_status(self, enum_status: TaskStatusEnum) -> TaskStatus:
         """Конвертация статуса из SQLAlchemy enum в Pydantic"""
-        mapping = {
-            TaskStatusEnum.CREATED: TaskStatus.CREATED,
-            TaskStatusEnum.IN_PROGRESS: TaskStatus.IN_PROGRESS,
-            TaskStatusEnum.COMPLETED: TaskStatus.COMPLETED
-        }
-        return mapping[enum_status]
+        return _STATUS_FROM_DB[enum_status]
     
     def _priority_to_enum(self, priority: Priority) -> PriorityEnum:
         """Конвертация приоритета из Pydantic в SQLAlchemy enum"""
-        mapping = {
-            Priority.LOW: PriorityEnum.LOW,
-            Priority.MEDIUM: PriorityEnum.MEDIUM,
-            Priority.HIGH: PriorityEnum.HIGH
-        }
-        return mapping[priority]
+        return _PRIORITY_TO_DB[priority]
 
     def _enum_to_priority(self, enum_priority: PriorityEnum) -> Priority:
         """Конвертация приоритета из SQLAlchemy enum в Pydantic"""
-        mapping = {
-            PriorityEnum.LOW: Priority.LOW,
-            PriorityEnum.MEDIUM: Priority.MEDIUM,
-            PriorityEnum.HIGH: Priority.HIGH
-        }
-        return mapping[enum_priority]
+        return _PRIORITY_FROM_DB[enum_priority]
     
     def _db_to_pydantic(self, db_task: TaskDB) -> Task:
-        """Конвертация SQLAlchemy модели в Pydantic"""
+        """Конвертация SQLAlchemy модели (или строки Core с теми же колонками) в Pydantic"""
         return Task(
             id=db_task.id,
             title=db_task.title,
             description=db_task.description,
-            status=self._enum_to_status(db_task.status),
-            priority=self._enum_to_priority(db_task.priority),
+            status=_STATUS_FROM_DB[db_task.status],
+            priority=_PRIORITY_FROM_DB[db_task.priority],
             deadline=db_task.deadline,
             created_at=db_task.created_at,
             updated_at=db_task.updated_at
         )
+
+    def _task_row(self, row) -> TaskRow:
+        """Строка Core (колонки _TASK_COLUMNS) -> словарь задачи для быстрой сериализации"""
+        # Распаковка по позиции заметно быстрее доступа к атрибутам Row по имени
+        title, description, status, priority, deadline, task_id, created_at, updated_at = row[:8]
+        return {
+            "title": title,
+            "description": description,
+            "status": _STATUS_FROM_DB[status],
+            "priority": _PRIORITY_FROM_DB[priority],
+            "deadline": deadline,
+            "id": task_id,
+            "created_at": created_at,
+            "updated_at": updated_at,
+        }
     
-    async def create_task(self, db: AsyncSession, task_data: TaskCreate, current_user: CurrentUser) -> Task:
-        """Создание новой задачи"""
-        db_task = TaskDB(
-            user_id=current_user.id,
-            title=task_data.title,
-            description=task_data.description,
-            status=self._status_to_enum(task_data.status),
-            priority=self._priority_to_enum(task_data.priority),
-            deadline=task_data.deadline
-        )
-        
-        db.add(db_task)
+    def _project_row(self, row, fields: Tuple[str, ...]) -> dict:
+        """Строка проекции (первые колонки - fields по порядку) -> словарь только с этими полями"""
+        item = dict(zip(fields, row))
+        if "status" in item:
+            item["status"] = _STATUS_FROM_DB[item["status"]]
+        if "priority" in item:
+            item["priority"] = _PRIORITY_FROM_DB[item["priority"]]
+        return item
+
+    def parse_fields(self, fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+        """
+        Разбор параметра fields ("id,title,status") в поля Task в каноническом порядке.
+        None - нужны все поля; ValueError - неизвестное поле.
+        """
+        if not fields:
+            return None
+        requested = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = requested.difference(TASK_FIELDS)
+        if unknown:
+            raise ValueError(f"Неизвестные поля: {', '.join(sorted(unknown))}. Допустимые: {', '.join(TASK_FIELDS)}")
+        if not requested or len(requested) == len(TASK_FIELDS):
+            return None
+        return tuple(name for name in TASK_FIELDS if name in requested)
+
+    async def _write(self, db: AsyncSession, operation: Callable[[AsyncSession], Awaitable[T]]) -> T:
+        """
+        Выполняет операцию записи operation(session) и фиксирует её.
+        Если запущена очередь группового коммита - через неё (коммит общий с
+        другими запросами), иначе в сессии запроса.
+        """
+        if write_queue is not None and write_queue.running:
+            try:
+                return await write_queue.submit(operation)
+            except WriteQueueStopped:
+                # Очередь остановилась раньше, чем дошла до операции: выполняем её сами
+                pass
+        result = await operation(db)
         await db.commit()
-        await db.refresh(db_task)
-        
-        return self._db_to_pydantic(db_task)
+        return result
+
+    def _new_task_row(self, task_data: TaskCreate, user_id: str, now: datetime) -> dict:
+        """Значения INSERT для новой задачи"""
+        return {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "title": task_data.title,
+            "description": task_data.description,
+            "status": self._status_to_enum(task_data.status),
+            "priority": self._priority_to_enum(task_data.priority),
+            "deadline": task_data.deadline,
+            "created_at": now,
+            "updated_at": now,
+        }
+
+    async def create_task(self, db: AsyncSession, task_data: TaskCreate, current_user: CurrentUser) -> Task:
+        """Создание новой задачи (INSERT ... RETURNING вместо commit + refresh)"""
+        async def operation(session: AsyncSession) -> Task:
+            row = self._new_task_row(task_data, current_user.id, datetime.now(timezone.utc))
+            statement = insert(TaskDB.__table__).values(row)
+            if session.get_bind().dialect.insert_returning:
+                result = await session.execute(statement.returning(*TaskDB.__table__.c))
+                return self._db_to_pydantic(result.one())
+            await session.execute(statement)
+            return (await self._load_tasks(session, [row["id"]]))[row["id"]]
+
+        task = await self._write(db, operation)
+        events.publish(events.EVENT_CREATED, task.id, current_user.id, task)
+        return task
     
     async def get_task(self, db: AsyncSession, task_id: str, current_user: CurrentUser) -> Optional[Task]:
-        """Получение задачи по ID"""
-        result = await db.execute(select(TaskDB).where(TaskDB.id == task_id))
-        db_task = result.scalar_one_or_none()
-        
-        if db_task is None:
-            return None
+        """Получение задачи по ID (read-through через кэш задач)"""
+        # Инвалидации после коммитов этого воркера могут ещё идти в фоне (внешнее хранилище)
+        await self.cache.settle()
+        cached = await self.cache.get(task_id)
+        if cached is None:
+            generation = self._cache_generation
+            result = await db.execute(select(TaskDB).where(TaskDB.id == task_id))
+            db_task = result.scalar_one_or_none()
+            if db_task is None:
+                return None
+            cached = (db_task.user_id, self._db_to_pydantic(db_task))
+            if generation == self._cache_generation:
+                await self.cache.set(task_id, cached)
+
+        owner_id, task = cached
         # Проверка доступа: админ или владелец
-        if current_user.role.value != "admin" and db_task.user_id != current_user.id:
+        if current_user.role.value != "admin" and owner_id != current_user.id:
             return None
-            
-        return self._db_to_pydantic(db_task)
+        return task
     
+    def _sort_key(self, sort_by: str):
+        """Выражение сортировки и признак того, что оно может быть NULL"""
+        if sort_by == "updated_at":
+            return TaskDB.updated_at, False
+        if sort_by == "status":
+            return TaskDB.status, False
+        if sort_by == "priority":
+            # Вычисляемая колонка с весом приоритета (есть индексы в порядке курсора)
+            return TaskDB.priority_rank, False
+        if sort_by == "deadline":
+            return TaskDB.deadline, True
+        if sort_by == "relevance":
+            # bm25: чем меньше, тем релевантнее
+            return tasks_fts.c.rank, False
+        return TaskDB.created_at, False
+
+    def _sort_value(self, row, sort_by: str):
+        """Значение ключа сортировки для строки результата (для построения курсора)"""
+        if sort_by == "relevance":
+            return row.rank
+        if sort_by == "priority":
+            return _PRIORITY_RANK[row.priority]
+        return getattr(row, sort_by)
+
+    def _fts_query(self, search: str) -> Optional[str]:
+        """
+        Запрос FTS5 из пользовательской строки: каждое слово ищется по префиксу,
+        слова объединяются через AND. Спецсимволы синтаксиса FTS5 отбрасываются.
+        """
+        words = re.findall(r"\w+", search.replace("ё", "е").replace("Ё", "Е"))
+        if not words:
+            return None
+        return " ".join(f'"{word}"*' for word in words)
+
+    def _encode_cursor(self, sort_by: str, sort_order: str, value, task_id: str, **extra) -> str:
+        """Упаковка позиции последней строки страницы (и extra) в непрозрачный курсор"""
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, TaskStatusEnum):
+            value = value.name
+        payload = {"s": sort_by, "o": sort_order, "v": value, "id": task_id, **extra}
+        raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    def _cursor_payload(self, cursor: str) -> dict:
+        """Содержимое курсора; ValueError, если курсор повреждён"""
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        except ValueError as exc:
+            raise ValueError("Некорректный курсор") from exc
+        if not isinstance(payload, dict):
+            raise ValueError("Некорректный курсор")
+        return payload
+
+    def _decode_cursor(self, cursor: str, sort_by: str, sort_order: str):
+        """Распаковка курсора; ValueError, если курсор повреждён или от другой сортировки"""
+        payload = self._cursor_payload(cursor)
+        try:
+            cursor_sort = (payload["s"], payload["o"])
+            value, task_id = payload["v"], str(payload["id"])
+            if value is not None:
+                if sort_by == "status":
+                    value = TaskStatusEnum[value]
+                elif sort_by == "priority":
+                    value = int(value)
+                elif sort_by == "relevance":
+                    value = float(value)
+                else:
+                    value = datetime.fromisoformat(value)
+        except (KeyError, TypeError, ValueError) as exc:
+            raise ValueError("Некорректный курсор") from exc
+        if cursor_sort != (sort_by, sort_order):
+            raise ValueError("Курсор не соответствует параметрам сортировки")
+        return value, task_id
+
+    def _keyset_condition(self, key, nullable: bool, descending: bool, value, last_id: str):
+        """
+        Условие "строго после (value, last_id)" в порядке сортировки.
+        NULL-ы идут первыми при asc и последними при desc (как в SQLite).
+        Для непустого value - сравнение пар (key, id): SQLite ищет по нему позицию
+        в индексе (key, id) сразу, а не перебирает строки с тем же key.
+        """
+        if value is None:
+            after_id = TaskDB.id < last_id if descending else TaskDB.id > last_id
+            if descending:
+                return and_(key.is_(None), after_id)
+            return or_(key.is_not(None), and_(key.is_(None), after_id))
+        position = tuple_(key, TaskDB.id)
+        # Типы колонок явно: сами по себе значения пары не получают типа key (enum -> имя)
+        cursor_position = tuple_(value, last_id, types=(key.type, TaskDB.id.type))
+        condition = position < cursor_position if descending else position > cursor_position
+        if nullable and descending:
+            condition = or_(condition, key.is_(None))
+        return condition
+
     async def get_tasks(
         self, 
         db: AsyncSession,
@@ -101,9 +336,106 @@ class TaskService:
         search: Optional[str] = None,
         sort_by: Optional[str] = None,
         sort_order: Optional[str] = "asc",
-        current_user: Optional[CurrentUser] = None) -> List[Task]:
-        """Получение списка задач с возможной фильтрацией по статусу"""
-        query = select(TaskDB)
+        current_user: Optional[CurrentUser] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None) -> TaskPage:
+        """
+        Получение страницы задач с фильтрацией, поиском и сортировкой.
+        Пагинация по ключу (keyset): курсор хранит значение сортировки и id
+        последней строки, поэтому глубокие страницы стоят столько же, сколько первая.
+        """
+        rows, next_cursor = await self._page_rows(db, status, search, sort_by, sort_order, current_user, limit, cursor)
+        return TaskPage(items=[self._db_to_pydantic(row) for row in rows], next_cursor=next_cursor)
+
+    async def get_tasks_json(
+        self,
+        db: AsyncSession,
+        status: Optional[TaskStatus] = None,
+        search: Optional[str] = None,
+        sort_by: Optional[str] = None,
+        sort_order: Optional[str] = "asc",
+        current_user: Optional[CurrentUser] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[Tuple[str, ...]] = None) -> bytes:
+        """
+        Та же страница, что get_tasks, сразу в JSON (TaskPage) - без моделей Task.
+        fields (см. parse_fields) - читать из БД и отдавать только эти поля задач.
+        """
+        rows, next_cursor = await self._page_rows(db, status, search, sort_by, sort_order, current_user, limit, cursor, fields)
+        if fields is None:
+            return TASK_PAGE_JSON.dump_json({"items": [self._task_row(row) for row in rows], "next_cursor": next_cursor})
+        return TASK_PARTIAL_PAGE_JSON.dump_json(
+            {"items": [self._project_row(row, fields) for row in rows], "next_cursor": next_cursor}
+        )
+
+    def _projection_columns(self, fields: Tuple[str, ...], sort_by: str):
+        """Колонки для fields и за ними служебные, нужные для курсора: id и ключ сортировки"""
+        names = list(fields)
+        for name in ("id", sort_by):
+            if name in _TASK_COLUMN_BY_NAME and name not in names:
+                names.append(name)
+        return tuple(_TASK_COLUMN_BY_NAME[name] for name in names)
+
+    async def export_tasks(
+        self,
+        export_format: str,
+        status: Optional[TaskStatus] = None,
+        search: Optional[str] = None,
+        sort_by: Optional[str] = None,
+        sort_order: Optional[str] = "asc",
+        current_user: Optional[CurrentUser] = None,
+        chunk_size: int = EXPORT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """
+        Выгрузка всех задач (фильтры и сортировка - как у get_tasks) кусками NDJSON или CSV.
+        Строки читаются из курсора БД по chunk_size, память не зависит от числа задач.
+        Сессия своя: генератор дочитывается уже после выхода из обработчика запроса.
+        """
+        query, _, _ = self._list_query(status, search, sort_by, sort_order, current_user)
+        if export_format == "csv":
+            yield self._csv_chunk([TASK_FIELDS])
+        async with AsyncReadSessionLocal() as session:
+            result = await session.stream(query.execution_options(yield_per=chunk_size))
+            async for rows in result.partitions():
+                if export_format == "csv":
+                    yield self._csv_chunk(self._csv_values(row) for row in rows)
+                else:
+                    yield b"".join(TASK_ROW_JSON.dump_json(self._task_row(row)) + b"\n" for row in rows)
+
+    def _csv_values(self, row) -> tuple:
+        """Строка Core (колонки _TASK_COLUMNS) -> значения CSV в порядке TASK_FIELDS"""
+        title, description, status, priority, deadline, task_id, created_at, updated_at = row[:8]
+        return (
+            title,
+            description,
+            _STATUS_FROM_DB[status].value,
+            _PRIORITY_FROM_DB[priority].value,
+            deadline.isoformat() if deadline is not None else None,
+            task_id,
+            created_at.isoformat(),
+            updated_at.isoformat(),
+        )
+
+    def _csv_chunk(self, rows) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode("utf-8")
+
+    def _list_query(self, status, search, sort_by, sort_order, current_user, cursor=None, fields=None):
+        """
+        SELECT списка задач (Core, колонки _TASK_COLUMNS или проекция fields) с фильтрами,
+        сортировкой и условием курсора. Возвращает запрос и итоговые sort_by, sort_order.
+        """
+        # Поиск по названию и описанию: в SQLite - по полнотекстовому индексу
+        fts_query = self._fts_query(search) if (search and IS_SQLITE) else None
+        # Сортировка; по умолчанию - по релевантности при поиске, иначе по дате создания (новые сначала)
+        if sort_by not in SORT_FIELDS:
+            sort_by, sort_order = ("relevance", "asc") if fts_query else ("created_at", "desc")
+        sort_order = "desc" if sort_order == "desc" else "asc"
+        descending = sort_order == "desc"
+        key, nullable = self._sort_key(sort_by)
+
+        query = select(*(_TASK_COLUMNS if fields is None else self._projection_columns(fields, sort_by)))
         # Ограничение по пользователю (не админ видит только свои)
         if current_user is not None and current_user.role.value != "admin":
             query = query.where(TaskDB.user_id == current_user.id)
@@ -111,8 +443,13 @@ class TaskService:
         if status is not None:
             enum_status = self._status_to_enum(status)
             query = query.where(TaskDB.status == enum_status)
-        # Поиск по названию и описанию
-        if search:
+        if fts_query:
+            query = (
+                query.add_columns(tasks_fts.c.rank)
+                .join(tasks_fts, tasks_fts.c.rowid == literal_column("tasks.rowid"))
+                .where(literal_column("tasks_fts").op("MATCH")(fts_query))
+            )
+        elif search:
             search_pattern = f"%{search}%"
             query = query.where(
                 or_(
@@ -120,115 +457,519 @@ class TaskService:
                     TaskDB.description.ilike(search_pattern)
                 )
             )
-        
-        # Сортировка
-        if sort_by:
-            if sort_by == "created_at":
-                query = query.order_by(TaskDB.created_at.desc() if sort_order == "desc" else TaskDB.created_at.asc())
-            elif sort_by == "updated_at":
-                query = query.order_by(TaskDB.updated_at.desc() if sort_order == "desc" else TaskDB.updated_at.asc())
-            elif sort_by == "status":
-                query = query.order_by(TaskDB.status.desc() if sort_order == "desc" else TaskDB.status.asc())
-            elif sort_by == "priority":
-                priority_order = {PriorityEnum.HIGH: 3, PriorityEnum.MEDIUM: 2, PriorityEnum.LOW: 1}
-                # Для сортировки по приоритету нужно использовать case
-                from sqlalchemy import case
-                query = query.order_by(
-                    case(
-                        (TaskDB.priority == PriorityEnum.HIGH, 3),
-                        (TaskDB.priority == PriorityEnum.MEDIUM, 2),
-                        (TaskDB.priority == PriorityEnum.LOW, 1),
-                        else_=0
-                    ).desc() if sort_order == "desc" else 
-                    case(
-                        (TaskDB.priority == PriorityEnum.HIGH, 3),
-                        (TaskDB.priority == PriorityEnum.MEDIUM, 2),
-                        (TaskDB.priority == PriorityEnum.LOW, 1),
-                        else_=0
-                    ).asc()
-                )
-            elif sort_by == "deadline":
-                query = query.order_by(TaskDB.deadline.desc() if sort_order == "desc" else TaskDB.deadline.asc())
+
+        if cursor:
+            value, last_id = self._decode_cursor(cursor, sort_by, sort_order)
+            query = query.where(self._keyset_condition(key, nullable, descending, value, last_id))
+
+        # id - стабильный тай-брейк, без него страницы могут терять/дублировать строки
+        if descending:
+            query = query.order_by(key.desc().nulls_last() if nullable else key.desc(), TaskDB.id.desc())
         else:
-            # Сортировка по умолчанию - по дате создания (новые сначала)
-            query = query.order_by(TaskDB.created_at.desc())
+            query = query.order_by(key.asc().nulls_first() if nullable else key.asc(), TaskDB.id.asc())
+        return query, sort_by, sort_order
+
+    async def _page_rows(self, db: AsyncSession, status, search, sort_by, sort_order, current_user, limit, cursor, fields=None):
+        """Строки страницы и курсор следующей страницы"""
+        query, sort_by, sort_order = self._list_query(status, search, sort_by, sort_order, current_user, cursor, fields)
+        if limit is not None:
+            # Берём на одну строку больше, чтобы узнать, есть ли следующая страница
+            query = query.limit(limit + 1)
         
         result = await db.execute(query)
-        db_tasks = result.scalars().all()
-        
-        return [self._db_to_pydantic(db_task) for db_task in db_tasks]
+        rows = result.all()
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = self._encode_cursor(sort_by, sort_order, self._sort_value(last, sort_by), last.id)
+        return rows, next_cursor
     
+    def _owned(self, statement, task_id: str, current_user: CurrentUser):
+        """Условие "задача task_id, доступная пользователю" (админ или владелец) в WHERE"""
+        statement = statement.where(TaskDB.id == task_id)
+        if current_user.role.value != "admin":
+            statement = statement.where(TaskDB.user_id == current_user.id)
+        return statement
+
     async def update_task(self, db: AsyncSession, task_id: str, task_data: TaskUpdate, current_user: CurrentUser) -> Optional[Task]:
-        """Обновление задачи"""
-        result = await db.execute(select(TaskDB).where(TaskDB.id == task_id))
-        db_task = result.scalar_one_or_none()
-        
-        if db_task is None:
+        """
+        Обновление задачи одним UPDATE: проверка доступа - в WHERE,
+        обновлённая строка возвращается через RETURNING.
+        """
+        async def operation(session: AsyncSession):
+            """(задача, владелец) или None"""
+            statement = self._owned(update(TaskDB.__table__), task_id, current_user).values(**self._update_values(task_data))
+            if session.get_bind().dialect.update_returning:
+                row = (await session.execute(statement.returning(*TaskDB.__table__.c))).one_or_none()
+            else:
+                # Диалект без RETURNING: тот же UPDATE, затем чтение обновлённой строки
+                result = await session.execute(statement)
+                row = None
+                if result.rowcount > 0:
+                    row = (await session.execute(select(TaskDB).where(TaskDB.id == task_id))).scalar_one()
+            if row is None:
+                return None
+            await invalidation_bus.record(session, [task_key(task_id)])
+            return self._db_to_pydantic(row), row.user_id
+
+        updated = await self._write(db, operation)
+        if updated is None:
             return None
-        # Проверка доступа
-        if current_user.role.value != "admin" and db_task.user_id != current_user.id:
+        task, owner_id = updated
+        events.publish(events.EVENT_UPDATED, task.id, owner_id, task)
+        return task
+    
+    async def delete_task(self, db: AsyncSession, task_id: str, current_user: CurrentUser) -> bool:
+        """Удаление задачи одним DELETE с проверкой доступа в WHERE"""
+        async def operation(session: AsyncSession) -> Optional[tuple]:
+            """(владелец,) удалённой задачи или None"""
+            if not IS_SQLITE:
+                await self._write_tombstones(session, self._owned(self._tombstone_select(), task_id, current_user))
+            statement = self._owned(delete(TaskDB.__table__), task_id, current_user)
+            if session.get_bind().dialect.delete_returning:
+                row = (await session.execute(statement.returning(TaskDB.__table__.c.user_id))).one_or_none()
+                deleted = (row.user_id,) if row is not None else None
+            else:
+                owner_id = (await session.execute(self._owned(select(TaskDB.user_id), task_id, current_user))).scalar_one_or_none()
+                result = await session.execute(statement)
+                deleted = (owner_id,) if result.rowcount > 0 else None
+            if deleted is not None:
+                await invalidation_bus.record(session, [task_key(task_id)])
+                await self._prune_tombstones(session)
+            return deleted
+
+        deleted = await self._write(db, operation)
+        if deleted is None:
+            return False
+        events.publish(events.EVENT_DELETED, task_id, deleted[0])
+        return True
+
+    def _tombstone_select(self):
+        """SELECT (id, user_id, сейчас) удаляемых задач для журнала deleted_tasks"""
+        return select(TaskDB.id, TaskDB.user_id, literal(datetime.now(timezone.utc).replace(tzinfo=None), DeletedTaskDB.deleted_at.type))
+
+    async def _write_tombstones(self, session: AsyncSession, selection) -> None:
+        """Журнал удалений вне SQLite (в SQLite его ведёт триггер tasks_tombstone_ad)"""
+        await session.execute(
+            insert(DeletedTaskDB.__table__).from_select(["task_id", "user_id", "deleted_at"], selection)
+        )
+
+    async def get_changes_json(
+        self, db: AsyncSession, since: Optional[datetime], current_user: CurrentUser,
+        limit: int = CHANGES_PAGE_SIZE, cursor: Optional[str] = None) -> bytes:
+        """
+        Страница задач, созданных или изменённых после since, и id удалённых после
+        since - сразу в JSON (TaskChanges), без моделей Task. Без since - полный снимок.
+        Страницы идут по (updated_at, id): next_cursor передаётся в следующий запрос
+        вместе с тем же since; удалённые приходят только на первой странице, водяная
+        отметка одна на все страницы. Отметка отстаёт от текущего времени на
+        CHANGES_SAFETY_WINDOW, поэтому изменения на границе могут прийти повторно -
+        клиент применяет их идемпотентно. since старше TOMBSTONE_RETENTION - resync:
+        журнал удалений за этот период уже почищен, нужен полный снимок.
+        ValueError при некорректном курсоре.
+        """
+        rows, deleted, watermark, next_cursor, resync = await self._changes_rows(db, since, current_user, limit, cursor)
+        return TASK_CHANGES_JSON.dump_json({
+            "changed": [self._task_row(row) for row in rows], "deleted": deleted,
+            "watermark": watermark, "next_cursor": next_cursor, "resync": resync,
+        })
+
+    async def _changes_rows(self, db: AsyncSession, since: Optional[datetime], current_user: CurrentUser,
+                            limit: int, cursor: Optional[str]):
+        """Изменённые строки (Core), id удалённых, водяная отметка, курсор следующей страницы и признак resync"""
+        if since is not None and since.tzinfo is not None:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        if since is not None and since < now - TOMBSTONE_RETENTION:
+            return [], [], now - CHANGES_SAFETY_WINDOW, None, True
+
+        query = select(*_TASK_COLUMNS)
+        if current_user.role.value != "admin":
+            query = query.where(TaskDB.user_id == current_user.id)
+        if since is not None:
+            query = query.where(TaskDB.updated_at > since)
+
+        deleted: List[str] = []
+        if cursor:
+            value, last_id = self._decode_cursor(cursor, "updated_at", "asc")
+            try:
+                watermark = datetime.fromisoformat(self._cursor_payload(cursor)["w"])
+            except (KeyError, TypeError, ValueError) as exc:
+                raise ValueError("Некорректный курсор") from exc
+            query = query.where(self._keyset_condition(TaskDB.updated_at, False, False, value, last_id))
+        else:
+            watermark = now - CHANGES_SAFETY_WINDOW
+            if since is not None and since > watermark:
+                watermark = since
+            if since is not None:
+                deleted_query = select(DeletedTaskDB.task_id).where(DeletedTaskDB.deleted_at > since)
+                if current_user.role.value != "admin":
+                    deleted_query = deleted_query.where(DeletedTaskDB.user_id == current_user.id)
+                deleted = list((await db.execute(deleted_query.order_by(DeletedTaskDB.deleted_at))).scalars())
+
+        # Берём на одну строку больше, чтобы узнать, есть ли следующая страница
+        rows = (await db.execute(query.order_by(TaskDB.updated_at, TaskDB.id).limit(limit + 1))).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = self._encode_cursor("updated_at", "asc", last.updated_at, last.id, w=watermark.isoformat())
+        return rows, deleted, watermark, next_cursor, False
+
+    async def _prune_tombstones(self, session: AsyncSession) -> None:
+        """
+        Чистка журнала удалений старше TOMBSTONE_RETENTION в транзакции удаления -
+        не чаще раза в TOMBSTONE_PRUNE_INTERVAL_S на процесс
+        """
+        now = monotonic()
+        if self._tombstones_pruned_at is not None and now - self._tombstones_pruned_at < TOMBSTONE_PRUNE_INTERVAL_S:
+            return
+        self._tombstones_pruned_at = now
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - TOMBSTONE_RETENTION
+        await session.execute(delete(DeletedTaskDB.__table__).where(DeletedTaskDB.deleted_at < cutoff))
+
+    def _counter_columns(self):
+        """
+        Условные агрегаты для счётчиков, не зависящих от времени (COUNTER_FIELDS).
+        COUNT(CASE ...) не считает NULL, поэтому на пустой выборке получаем 0, а не NULL.
+        """
+        return (
+            func.count(TaskDB.id).label("total"),
+            func.count(case((TaskDB.status == TaskStatusEnum.CREATED, 1))).label("created"),
+            func.count(case((TaskDB.status == TaskStatusEnum.IN_PROGRESS, 1))).label("in_progress"),
+            func.count(case((TaskDB.status == TaskStatusEnum.COMPLETED, 1))).label("completed"),
+            func.count(case((TaskDB.priority == PriorityEnum.HIGH, 1))).label("high_priority"),
+            func.count(case((TaskDB.priority == PriorityEnum.MEDIUM, 1))).label("medium_priority"),
+            func.count(case((TaskDB.priority == PriorityEnum.LOW, 1))).label("low_priority"),
+        )
+
+    def _overdue_condition(self, today_start: datetime):
+        """Незавершённая задача со сроком раньше сегодняшнего дня (под частичные индексы *_open_deadline)"""
+        return and_(
+            TaskDB.deadline.is_not(None),
+            text(OPEN_TASK_SQL),
+            TaskDB.deadline < today_start,
+        )
+
+    def _completed_today_condition(self, today_start: datetime):
+        """Задача завершена (последнее изменение) сегодня"""
+        return and_(
+            TaskDB.status == TaskStatusEnum.COMPLETED,
+            TaskDB.updated_at >= today_start,
+            TaskDB.updated_at < today_start + timedelta(days=1),
+        )
+
+    def _statistics_columns(self, today_start: datetime):
+        """Условные агрегаты для всех полей TaskStatistics"""
+        return self._counter_columns() + (
+            func.count(case((self._overdue_condition(today_start), 1))).label("overdue"),
+            func.count(case((self._completed_today_condition(today_start), 1))).label("completed_today"),
+        )
+
+    async def get_change_version(self, db: AsyncSession, current_user: CurrentUser) -> Optional[int]:
+        """
+        Версия набора задач, видимых пользователю (админу - всех): растёт при любом
+        их изменении. None - версии не ведутся (не SQLite, нет триггеров).
+        """
+        if not IS_SQLITE:
             return None
-        
-        update_data = task_data.dict(exclude_unset=True)
-        
+        key = GLOBAL_COUNTERS_KEY if current_user.role.value == "admin" else current_user.id
+        version = (await db.execute(select(TaskCounterDB.version).where(TaskCounterDB.user_id == key))).scalar()
+        return version or 0
+
+    async def get_statistics(self, db: AsyncSession, current_user: Optional[CurrentUser] = None) -> TaskStatistics:
+        """
+        Получение статистики задач.
+        Не админ видит статистику только по своим задачам.
+        """
+        # Даты в БД хранятся в UTC без таймзоны, поэтому и "сегодня" считаем в UTC
+        today_start = datetime.combine(datetime.now(timezone.utc).date(), time.min)
+        user_id = None
+        if current_user is not None and current_user.role.value != "admin":
+            user_id = current_user.id
+
+        if IS_SQLITE:
+            return await self._statistics_from_counters(db, user_id, today_start)
+
+        # Без счётчиков - один агрегирующий запрос по tasks
+        query = select(*self._statistics_columns(today_start))
+        if user_id is not None:
+            query = query.where(TaskDB.user_id == user_id)
+        row = (await db.execute(query)).one()
+        return TaskStatistics(**row._mapping)
+
+    async def _statistics_from_counters(self, db: AsyncSession, user_id: Optional[str], today_start: datetime) -> TaskStatistics:
+        """
+        Статистика из task_counters: строка счётчиков читается по первичному ключу.
+        overdue и completed_today зависят от текущей даты, их считаем подзапросами
+        в том же SELECT только по индексам: overdue - по частичному индексу
+        незавершённых задач (обходятся только просроченные из них), completed_today -
+        по диапазону updated_at за сегодня.
+        """
+        overdue = select(func.count()).select_from(TaskDB).where(self._overdue_condition(today_start))
+        completed_today = select(func.count()).select_from(TaskDB).where(self._completed_today_condition(today_start))
+        if user_id is not None:
+            overdue = overdue.where(TaskDB.user_id == user_id)
+            completed_today = completed_today.where(TaskDB.user_id == user_id)
+
+        query = select(
+            *(getattr(TaskCounterDB, field) for field in COUNTER_FIELDS),
+            overdue.scalar_subquery().label("overdue"),
+            completed_today.scalar_subquery().label("completed_today"),
+        ).where(TaskCounterDB.user_id == (user_id or GLOBAL_COUNTERS_KEY))
+
+        row = (await db.execute(query)).one_or_none()
+        if row is None:
+            # У пользователя ещё не было ни одной задачи
+            return TaskStatistics(**{field: 0 for field in TaskStatistics.model_fields})
+        return TaskStatistics(**row._mapping)
+
+    def _update_values(self, task_data: TaskUpdate) -> dict:
+        """Значения для UPDATE из TaskUpdate: только переданные поля + updated_at"""
+        update_data = task_data.model_dump(exclude_unset=True, exclude={"id"})
         if "status" in update_data:
             update_data["status"] = self._status_to_enum(update_data["status"])
         if "priority" in update_data:
             update_data["priority"] = self._priority_to_enum(update_data["priority"])
-        
         update_data["updated_at"] = datetime.now(timezone.utc)
-        
-        await db.execute(
-            update(TaskDB)
-            .where(TaskDB.id == task_id)
-            .values(**update_data)
-        )
-        await db.commit()
-        
-        result = await db.execute(select(TaskDB).where(TaskDB.id == task_id))
-        updated_task = result.scalar_one()
-        
-        return self._db_to_pydantic(updated_task)
-    
-    async def delete_task(self, db: AsyncSession, task_id: str, current_user: CurrentUser) -> bool:
-        """Удаление задачи"""
-        # Проверяем существование задачи
-        result = await db.execute(select(TaskDB).where(TaskDB.id == task_id))
-        db_task = result.scalar_one_or_none()
-        
-        if db_task is None:
-            return False
-        # Проверка доступа
-        if current_user.role.value != "admin" and db_task.user_id != current_user.id:
-            return False
-        
-        # Удаляем задачу
-        await db.execute(delete(TaskDB).where(TaskDB.id == task_id))
-        await db.commit()
-        
-        return True
+        return update_data
 
-    async def get_statistics(self, db: AsyncSession) -> TaskStatistics:
-        """Получение статистики задач"""
-        all_tasks = await db.execute(select(TaskDB))
-        tasks = all_tasks.scalars().all()
-        
-        today = date.today()
-        
-        stats = TaskStatistics(
-            total=len(tasks),
-            created=sum(1 for t in tasks if t.status == TaskStatusEnum.CREATED),
-            in_progress=sum(1 for t in tasks if t.status == TaskStatusEnum.IN_PROGRESS),
-            completed=sum(1 for t in tasks if t.status == TaskStatusEnum.COMPLETED),
-            overdue=sum(1 for t in tasks if t.deadline and t.status != TaskStatusEnum.COMPLETED and t.deadline < today),
-            high_priority=sum(1 for t in tasks if t.priority == PriorityEnum.HIGH),
-            medium_priority=sum(1 for t in tasks if t.priority == PriorityEnum.MEDIUM),
-            low_priority=sum(1 for t in tasks if t.priority == PriorityEnum.LOW),
-            completed_today=sum(1 for t in tasks if t.status == TaskStatusEnum.COMPLETED and t.updated_at.date() == today)
+    async def _load_tasks(self, db: AsyncSession, task_ids) -> Dict[str, Task]:
+        """Загрузка задач по списку id одним запросом"""
+        if not task_ids:
+            return {}
+        result = await db.execute(select(TaskDB).where(TaskDB.id.in_(task_ids)))
+        return {db_task.id: self._db_to_pydantic(db_task) for db_task in result.scalars()}
+
+    async def _accessible_owners(self, db: AsyncSession, task_ids, current_user: CurrentUser) -> Dict[str, str]:
+        """Из списка id - те, что существуют и доступны пользователю: {id: владелец} (одним запросом)"""
+        query = select(TaskDB.id, TaskDB.user_id).where(TaskDB.id.in_(set(task_ids)))
+        if current_user.role.value != "admin":
+            query = query.where(TaskDB.user_id == current_user.id)
+        return {row.id: row.user_id for row in await db.execute(query)}
+
+    async def create_tasks(self, db: AsyncSession, items: List[TaskCreate], current_user: CurrentUser) -> List[BulkItemResult]:
+        """Массовое создание задач: один executemany INSERT в одной транзакции"""
+        async def operation(session: AsyncSession) -> List[BulkItemResult]:
+            now = datetime.now(timezone.utc)
+            rows = [self._new_task_row(item, current_user.id, now) for item in items]
+            await session.execute(insert(TaskDB.__table__), rows)
+
+            created = await self._load_tasks(session, [row["id"] for row in rows])
+            return [
+                BulkItemResult(index=index, id=row["id"], ok=True, task=created[row["id"]])
+                for index, row in enumerate(rows)
+            ]
+
+        results = await self._write(db, operation)
+        for result in results:
+            events.publish(events.EVENT_CREATED, result.id, current_user.id, result.task)
+        return results
+
+    async def import_tasks(
+        self,
+        db: AsyncSession,
+        chunks: AsyncIterator[bytes],
+        current_user: CurrentUser,
+        batch_size: int = IMPORT_BATCH_SIZE) -> TaskImportResult:
+        """
+        Импорт задач из потока NDJSON (по TaskCreate в строке). Строки проверяются по мере
+        чтения тела, валидные вставляются пачками по batch_size, каждая пачка - своей
+        транзакцией. Тело целиком в памяти не держится.
+        """
+        imported = failed = 0
+        errors: List[TaskImportError] = []
+        batch: List[Tuple[int, TaskCreate]] = []
+
+        def fail(line: int, message: str) -> None:
+            nonlocal failed
+            failed += 1
+            if len(errors) < IMPORT_MAX_ERRORS:
+                errors.append(TaskImportError(line=line, error=message))
+
+        async def flush() -> None:
+            nonlocal imported
+            try:
+                await self._import_batch(db, [task for _, task in batch], current_user)
+            except SQLAlchemyError as exc:
+                await db.rollback()
+                for line, _ in batch:
+                    fail(line, f"Ошибка записи в БД: {exc.__class__.__name__}")
+            else:
+                imported += len(batch)
+            batch.clear()
+
+        async for line, raw in self._ndjson_lines(chunks):
+            if raw is None:
+                fail(line, f"Строка длиннее {IMPORT_MAX_LINE_BYTES} байт")
+                continue
+            if not raw.strip():
+                continue
+            try:
+                batch.append((line, TaskCreate.model_validate_json(raw)))
+            except ValidationError as exc:
+                fail(line, self._validation_message(exc))
+                continue
+            if len(batch) >= batch_size:
+                await flush()
+        if batch:
+            await flush()
+        return TaskImportResult(imported=imported, failed=failed, errors=errors)
+
+    async def _import_batch(self, db: AsyncSession, items: List[TaskCreate], current_user: CurrentUser) -> None:
+        """
+        Одна пачка импорта: executemany INSERT без перечитывания задач. Вместо события
+        на каждую задачу подписчикам уходит одно resync - они догрузят изменения сами.
+        """
+        async def operation(session: AsyncSession) -> None:
+            now = datetime.now(timezone.utc)
+            await session.execute(insert(TaskDB.__table__), [self._new_task_row(item, current_user.id, now) for item in items])
+
+        await self._write(db, operation)
+        events.publish(events.EVENT_RESYNC, None, current_user.id)
+
+    async def _ndjson_lines(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+        """
+        Строки NDJSON из потока кусков тела: (номер строки с 1, байты строки).
+        Вместо слишком длинной строки отдаётся None, сама она не накапливается.
+        """
+        pending = b""
+        line = 0
+        oversized = False
+        async for chunk in chunks:
+            parts = (pending + chunk).split(b"\n")
+            pending = parts.pop()
+            for part in parts:
+                line += 1
+                yield line, None if oversized or len(part) > IMPORT_MAX_LINE_BYTES else part
+                oversized = False
+            if len(pending) > IMPORT_MAX_LINE_BYTES:
+                oversized, pending = True, b""
+        if oversized or pending.strip():
+            yield line + 1, None if oversized else pending
+
+    def _validation_message(self, exc: ValidationError) -> str:
+        """Краткое описание ошибок валидации строки: "поле: сообщение; ..." """
+        return "; ".join(
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" if error["loc"] else error["msg"]
+            for error in exc.errors()
         )
-        
-        return stats
+
+    async def update_tasks(self, db: AsyncSession, items: List[TaskBulkUpdateItem], current_user: CurrentUser) -> List[BulkItemResult]:
+        """
+        Массовое обновление задач: доступ проверяется одним запросом, затем
+        по одному executemany UPDATE на каждый набор изменяемых полей, всё в одной транзакции.
+        """
+        accessible: Dict[str, str] = {}
+
+        async def operation(session: AsyncSession) -> List[BulkItemResult]:
+            nonlocal accessible
+            accessible = await self._accessible_owners(session, [item.id for item in items], current_user)
+
+            results: List[BulkItemResult] = []
+            groups: Dict[tuple, List[dict]] = {}
+            seen = set()
+            for index, item in enumerate(items):
+                if item.id in seen:
+                    results.append(BulkItemResult(index=index, id=item.id, ok=False, error="Повторный id в запросе"))
+                    continue
+                seen.add(item.id)
+                if item.id not in accessible:
+                    results.append(BulkItemResult(index=index, id=item.id, ok=False, error="Задача не найдена"))
+                    continue
+                values = self._update_values(item)
+                groups.setdefault(tuple(sorted(values)), []).append({"b_id": item.id, **{f"b_{k}": v for k, v in values.items()}})
+                results.append(BulkItemResult(index=index, id=item.id, ok=True))
+
+            table = TaskDB.__table__
+            for fields, params in groups.items():
+                statement = (
+                    update(table)
+                    .where(table.c.id == bindparam("b_id"))
+                    .values({field: bindparam(f"b_{field}") for field in fields})
+                )
+                await session.execute(statement, params)
+
+            changed_ids = [r.id for r in results if r.ok]
+            await invalidation_bus.record(session, [task_key(task_id) for task_id in changed_ids])
+            updated = await self._load_tasks(session, changed_ids)
+            for result in results:
+                if result.ok:
+                    result.task = updated[result.id]
+            return results
+
+        results = await self._write(db, operation)
+        for result in results:
+            if result.ok:
+                events.publish(events.EVENT_UPDATED, result.id, accessible[result.id], result.task)
+        return results
+
+    async def delete_tasks(self, db: AsyncSession, task_ids: List[str], current_user: CurrentUser) -> List[BulkItemResult]:
+        """Массовое удаление задач: проверка доступа и DELETE ... WHERE id IN (...) в одной транзакции"""
+        async def operation(session: AsyncSession) -> Dict[str, str]:
+            accessible = await self._accessible_owners(session, task_ids, current_user)
+            if accessible:
+                if not IS_SQLITE:
+                    await self._write_tombstones(session, self._tombstone_select().where(TaskDB.id.in_(list(accessible))))
+                await session.execute(delete(TaskDB).where(TaskDB.id.in_(list(accessible))))
+                await invalidation_bus.record(session, [task_key(task_id) for task_id in accessible])
+                await self._prune_tombstones(session)
+            return accessible
+
+        accessible = await self._write(db, operation)
+        results = []
+        seen = set()
+        for index, task_id in enumerate(task_ids):
+            if task_id in seen:
+                results.append(BulkItemResult(index=index, id=task_id, ok=False, error="Повторный id в запросе"))
+            elif task_id in accessible:
+                results.append(BulkItemResult(index=index, id=task_id, ok=True))
+            else:
+                results.append(BulkItemResult(index=index, id=task_id, ok=False, error="Задача не найдена"))
+            seen.add(task_id)
+        for task_id, owner_id in accessible.items():
+            events.publish(events.EVENT_DELETED, task_id, owner_id)
+        return results
+
+    async def verify_counters(self, db: AsyncSession) -> List[dict]:
+        """
+        Сравнивает task_counters с пересчётом по tasks.
+        Возвращает расхождения: user_id, поле, ожидаемое и фактическое значение.
+        """
+        expected = {}
+        rows = await db.execute((
+            select(TaskDB.user_id, *self._counter_columns())
+            .where(TaskDB.user_id.is_not(None))
+            .group_by(TaskDB.user_id)
+        ))
+        for row in rows:
+            expected[row.user_id] = {field: getattr(row, field) for field in COUNTER_FIELDS}
+        row = (await db.execute(select(*self._counter_columns()))).one()
+        expected[GLOBAL_COUNTERS_KEY] = {field: getattr(row, field) for field in COUNTER_FIELDS}
+
+        actual = {}
+        for counter in (await db.execute(select(TaskCounterDB))).scalars():
+            actual[counter.user_id] = {field: getattr(counter, field) for field in COUNTER_FIELDS}
+
+        zeros = {field: 0 for field in COUNTER_FIELDS}
+        drift = []
+        for user_id in sorted(set(expected) | set(actual)):
+            want = expected.get(user_id, zeros)
+            have = actual.get(user_id, zeros)
+            for field in COUNTER_FIELDS:
+                if want[field] != have[field]:
+                    drift.append({"user_id": user_id, "field": field, "expected": want[field], "actual": have[field]})
+        return drift
+
+    async def rebuild_counters(self, db: AsyncSession) -> None:
+        """Полный пересчёт task_counters по таблице tasks"""
+        await rebuild_task_counters(db)
+        await db.commit()
     
 
 # Глобальный экземпляр сервиса
 task_service = TaskService()
+# Изменения задач (в том числе в других воркерах) вычищают их из кэша
+invalidation_bus.subscribe("task:", task_service._on_invalidate)
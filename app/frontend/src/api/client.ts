@@ -1,5 +1,5 @@
 import axios from 'axios';
-import type { Task, TaskCreate, TaskUpdate, TaskStatus, TaskStatistics, SortBy, SortOrder } from '../types/task';
+import type { Task, TaskCreate, TaskUpdate, TaskStatus, TaskStatistics, TaskPage, TaskChanges, SortBy, SortOrder } from '../types/task';
 
 const API_BASE_URL = 'http://localhost:8000/api/v1';
 
@@ -21,22 +21,65 @@ apiClient.interceptors.request.use((config) => {
 });
 
 export const taskApi = {
-  // Получить все задачи
+  // Получить все задачи (проходим по страницам, пока сервер отдаёт next_cursor)
   getTasks: async (
     status?: TaskStatus,
     search?: string,
     sortBy?: SortBy,
     sortOrder?: SortOrder
   ): Promise<Task[]> => {
-    const response = await apiClient.get<Task[]>('/tasks/', {
-      params: {
-        ...(status && { status }),
-        ...(search && { search }),
-        ...(sortBy && { sort_by: sortBy }),
-        ...(sortOrder && { sort_order: sortOrder }),
-      },
-    });
-    return response.data;
+    const tasks: Task[] = [];
+    let cursor: string | null = null;
+    do {
+      const response: { data: TaskPage } = await apiClient.get<TaskPage>('/tasks/', {
+        params: {
+          ...(status && { status }),
+          ...(search && { search }),
+          ...(sortBy && { sort_by: sortBy }),
+          ...(sortOrder && { sort_order: sortOrder }),
+          limit: 500,
+          ...(cursor && { cursor }),
+        },
+      });
+      tasks.push(...response.data.items);
+      cursor = response.data.next_cursor;
+    } while (cursor);
+    return tasks;
+  },
+
+  // Изменения после watermark (без since - полный снимок); watermark ответа передаётся в следующий вызов.
+  // Проходим по страницам, как getTasks; resync - since устарел, нужен полный снимок
+  getTaskChanges: async (since?: string | null): Promise<TaskChanges> => {
+    const fetchPage = async (cursor: string | null): Promise<TaskChanges> => {
+      const response = await apiClient.get<TaskChanges>('/tasks/changes', {
+        params: {
+          ...(since && { since }),
+          limit: 500,
+          ...(cursor && { cursor }),
+        },
+      });
+      return response.data;
+    };
+    const changes = await fetchPage(null);
+    let cursor = changes.resync ? null : changes.next_cursor;
+    while (cursor) {
+      const page = await fetchPage(cursor);
+      changes.changed.push(...page.changed);
+      cursor = page.next_cursor;
+    }
+    return { ...changes, next_cursor: null };
+  },
+
+  // Лента изменений задач (SSE): onChange вызывается на каждое событие; возвращает функцию отписки.
+  // EventSource не умеет заголовки, поэтому токен передаётся в access_token
+  subscribeTaskEvents: (onChange: () => void): (() => void) => {
+    const token = localStorage.getItem('tm_access_token');
+    const query = token ? `?access_token=${encodeURIComponent(token)}` : '';
+    const source = new EventSource(`${API_BASE_URL}/tasks/events${query}`);
+    for (const type of ['created', 'updated', 'deleted', 'resync']) {
+      source.addEventListener(type, onChange);
+    }
+    return () => source.close();
   },
 
   // Получить задачу по ID
@@ -69,6 +112,30 @@ export const taskApi = {
   },
 };
 
+// Применяет дельту к списку задач: удалённые убираются, изменённые заменяются,
+// новые (если проходят фильтр accept) добавляются в начало
+export function applyTaskChanges(
+  tasks: Task[],
+  changes: TaskChanges,
+  accept: (task: Task) => boolean = () => true
+): Task[] {
+  const deleted = new Set(changes.deleted);
+  const changed = new Map(changes.changed.map((task) => [task.id, task]));
+  const result: Task[] = [];
+  for (const task of tasks) {
+    if (deleted.has(task.id)) continue;
+    const updated = changed.get(task.id);
+    changed.delete(task.id);
+    if (!updated) {
+      result.push(task);
+    } else if (accept(updated)) {
+      result.push(updated);
+    }
+  }
+  const added = [...changed.values()].filter(accept).reverse();
+  return [...added, ...result];
+}
+
 // Вспомогательная функция для декодирования JWT токена
 function decodeJWT(token: string): { username?: string } | null {
   try {
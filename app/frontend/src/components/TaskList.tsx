@@ -1,6 +1,6 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import type { Task, TaskStatus, SortBy, SortOrder } from '../types/task';
-import { taskApi } from '../api/client';
+import { taskApi, applyTaskChanges } from '../api/client';
 import { TaskCard } from './TaskCard';
 import { TaskForm } from './TaskForm';
 import { FilterBar } from './FilterBar';
@@ -16,6 +16,8 @@ export const TaskList: React.FC = () => {
   const [sortOrder, setSortOrder] = useState<SortOrder>('asc');
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  // Водяная отметка дельта-синхронизации (/tasks/changes) для allTasks
+  const watermark = useRef<string | null>(null);
 
   const loadTasks = useCallback(async () => {
     setIsLoading(true);
@@ -29,9 +31,10 @@ export const TaskList: React.FC = () => {
       );
       setTasks(data);
       
-      // Загружаем все задачи для счетчиков
-      const allData = await taskApi.getTasks();
-      setAllTasks(allData);
+      // Все задачи для счетчиков - полным снимком через /tasks/changes
+      const snapshot = await taskApi.getTaskChanges();
+      watermark.current = snapshot.watermark;
+      setAllTasks(snapshot.changed);
     } catch (err) {
       console.error('Ошибка загрузки задач:', err);
       setError('Не удалось загрузить задачи. Убедитесь, что backend сервер запущен на http://localhost:8000');
@@ -40,6 +43,45 @@ export const TaskList: React.FC = () => {
     }
   }, [filter, searchQuery, sortBy, sortOrder]);
 
+  // После изменения задачи запрашиваем только дельту вместо полной перезагрузки.
+  // Видимый список патчим на месте, если его порядок не зависит от сервера
+  // (без поиска и сортировки - новые задачи просто идут первыми)
+  const syncTasks = useCallback(async () => {
+    if (watermark.current === null || searchQuery || sortBy) {
+      await loadTasks();
+      return;
+    }
+    try {
+      const changes = await taskApi.getTaskChanges(watermark.current);
+      if (changes.resync) {
+        await loadTasks();
+        return;
+      }
+      watermark.current = changes.watermark;
+      setAllTasks((current) => applyTaskChanges(current, changes));
+      setTasks((current) => applyTaskChanges(current, changes, (task) => !filter || task.status === filter));
+    } catch (err) {
+      console.error('Ошибка синхронизации задач:', err);
+      await loadTasks();
+    }
+  }, [loadTasks, filter, searchQuery, sortBy]);
+
+  // Изменения от других вкладок и пользователей приходят по SSE; пачку событий
+  // схлопываем в одну дельта-синхронизацию
+  const syncRef = useRef(syncTasks);
+  syncRef.current = syncTasks;
+  useEffect(() => {
+    let timeoutId: ReturnType<typeof setTimeout> | undefined;
+    const unsubscribe = taskApi.subscribeTaskEvents(() => {
+      clearTimeout(timeoutId);
+      timeoutId = setTimeout(() => syncRef.current(), 200);
+    });
+    return () => {
+      clearTimeout(timeoutId);
+      unsubscribe();
+    };
+  }, []);
+
   useEffect(() => {
     const timeoutId = setTimeout(() => {
       loadTasks();
@@ -68,7 +110,7 @@ export const TaskList: React.FC = () => {
     <div>
       <Statistics />
 
-      <TaskForm onSuccess={loadTasks} />
+      <TaskForm onSuccess={syncTasks} />
 
       <FilterBar
         currentFilter={filter}
@@ -106,7 +148,7 @@ export const TaskList: React.FC = () => {
       {!isLoading && !error && tasks.length > 0 && (
         <div className="grid gap-4 md:grid-cols-2 lg:grid-cols-3">
           {tasks.map((task) => (
-            <TaskCard key={task.id} task={task} onUpdate={loadTasks} />
+            <TaskCard key={task.id} task={task} onUpdate={syncTasks} />
           ))}
         </div>
       )}
@@ -21,6 +21,19 @@ export interface Task {
   updated_at: string;
 }
 
+export interface TaskPage {
+  items: Task[];
+  next_cursor: string | null;
+}
+
+export interface TaskChanges {
+  changed: Task[];
+  deleted: string[];
+  watermark: string;
+  next_cursor: string | null;
+  resync: boolean;
+}
+
 export interface TaskCreate {
   title: string;
   description?: string;
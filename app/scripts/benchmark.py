@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный бенчмарк TaskManager API
+
+Гоняет смесь запросов (вход, список, поиск, чтение, создание, обновление,
+статистика) с заданной конкурентностью и печатает задержки p50/p95/p99 и req/s
+по каждой операции и в целом. Результат сохраняется в JSON (--output) и может
+сравниваться с сохранённым ранее (--baseline): при регрессии больше
+--max-regression скрипт завершается с кодом 1.
+
+Цели:
+  по умолчанию  - приложение в этом же процессе через ASGI-транспорт httpx
+                  (без сети; клиент и сервер делят один event loop)
+  --uvicorn     - отдельный процесс uvicorn на свободном порту
+  --url URL     - уже запущенный сервер
+
+Для ASGI и --uvicorn база по умолчанию - временный файл SQLite, чтобы не трогать
+рабочую; после прогона он удаляется (--keep-db - оставить для разбора). Другую
+базу можно указать через --database-url (например, подготовленную
+generate_dataset.py).
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+# Добавляем корневую директорию проекта в путь для импорта
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+API = "/api/v1"
+DEFAULT_MIX = "list=30,search=15,get=20,create=10,update=15,statistics=9,login=1"
+PASSWORD = "bench-password"
+SEARCH_WORDS = ("отчёт", "релиз", "встреча", "тест", "api", "дизайн", "клиент", "ошибка")
+TITLE_WORDS = SEARCH_WORDS + ("план", "задача", "проверка", "документация", "сервер", "обзор")
+STATUSES = ("новая", "в работе", "завершено")
+PRIORITIES = ("низкий", "средний", "высокий")
+
+
+class BenchUser:
+    """Пользователь бенчмарка: токен и известные ему задачи"""
+
+    def __init__(self, username: str):
+        self.username = username
+        self.headers: dict = {}
+        self.task_ids: list = []
+
+
+def parse_mix(mix: str) -> dict:
+    """"list=30,get=20" -> {"list": 30, "get": 20}"""
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Неизвестная операция '{name}', допустимые: {', '.join(OPERATIONS)}")
+        weights[name] = float(weight or 1)
+    return {name: weight for name, weight in weights.items() if weight > 0}
+
+
+def random_task(rng: random.Random) -> dict:
+    return {
+        "title": " ".join(rng.choice(TITLE_WORDS) for _ in range(rng.randint(2, 5))),
+        "description": " ".join(rng.choice(TITLE_WORDS) for _ in range(rng.randint(0, 30))) or None,
+        "status": rng.choice(STATUSES),
+        "priority": rng.choice(PRIORITIES),
+    }
+
+
+# Операции: (client, user, rng) -> ответ
+async def op_login(client, user, rng):
+    return await client.post(f"{API}/auth/login", data={"username": user.username, "password": PASSWORD})
+
+
+async def op_list(client, user, rng):
+    return await client.get(f"{API}/tasks/", params={"limit": 50}, headers=user.headers)
+
+
+async def op_search(client, user, rng):
+    return await client.get(f"{API}/tasks/", params={"search": rng.choice(SEARCH_WORDS), "limit": 50}, headers=user.headers)
+
+
+async def op_get(client, user, rng):
+    return await client.get(f"{API}/tasks/{rng.choice(user.task_ids)}", headers=user.headers)
+
+
+async def op_create(client, user, rng):
+    response = await client.post(f"{API}/tasks/", json=random_task(rng), headers=user.headers)
+    if response.status_code == 201:
+        user.task_ids.append(response.json()["id"])
+    return response
+
+
+async def op_update(client, user, rng):
+    payload = {"status": rng.choice(STATUSES), "priority": rng.choice(PRIORITIES)}
+    return await client.put(f"{API}/tasks/{rng.choice(user.task_ids)}", json=payload, headers=user.headers)
+
+
+async def op_statistics(client, user, rng):
+    return await client.get(f"{API}/tasks/statistics/summary", headers=user.headers)
+
+
+OPERATIONS = {
+    "login": op_login,
+    "list": op_list,
+    "search": op_search,
+    "get": op_get,
+    "create": op_create,
+    "update": op_update,
+    "statistics": op_statistics,
+}
+
+
+async def setup_users(client, count: int, tasks_per_user: int, rng: random.Random) -> list:
+    """Регистрирует (или переиспользует) пользователей и создаёт им стартовые задачи"""
+    users = []
+    for index in range(count):
+        user = BenchUser(f"bench_user_{index}")
+        await client.post(f"{API}/auth/register", json={"username": user.username, "password": PASSWORD})
+        response = await client.post(f"{API}/auth/login", data={"username": user.username, "password": PASSWORD})
+        response.raise_for_status()
+        user.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        for start in range(0, tasks_per_user, 1000):
+            items = [random_task(rng) for _ in range(min(1000, tasks_per_user - start))]
+            response = await client.post(f"{API}/tasks/bulk", json={"items": items}, headers=user.headers)
+            response.raise_for_status()
+        response = await client.get(f"{API}/tasks/", params={"limit": 1000, "fields": "id"}, headers=user.headers)
+        response.raise_for_status()
+        user.task_ids = [task["id"] for task in response.json()["items"]]
+        if not user.task_ids:
+            # Операциям get/update нужна хотя бы одна задача
+            response = await client.post(f"{API}/tasks/", json=random_task(rng), headers=user.headers)
+            response.raise_for_status()
+            user.task_ids.append(response.json()["id"])
+        users.append(user)
+    return users
+
+
+async def run_load(client, users: list, weights: dict, total: int, concurrency: int, seed: int) -> tuple:
+    """Выполняет total запросов в concurrency потоков; возвращает замеры и длительность"""
+    names = list(weights)
+    shares = list(weights.values())
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    remaining = total
+
+    async def worker(number: int):
+        nonlocal remaining
+        rng = random.Random(seed * 1000 + number)
+        while remaining > 0:
+            remaining -= 1
+            name = rng.choices(names, weights=shares)[0]
+            user = rng.choice(users)
+            started = time.perf_counter()
+            try:
+                response = await OPERATIONS[name](client, user, rng)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            samples[name].append(time.perf_counter() - started)
+            if failed:
+                errors[name] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(number) for number in range(concurrency)))
+    return samples, errors, time.perf_counter() - started
+
+
+def percentile(values: list, q: float) -> float:
+    """Перцентиль по ближайшему рангу (values отсортирован)"""
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+
+def summarize(values: list, errors: int, duration: float) -> dict:
+    values = sorted(values)
+    ms = 1000
+    return {
+        "count": len(values),
+        "errors": errors,
+        "rps": round(len(values) / duration, 1) if duration else 0.0,
+        "mean_ms": round(sum(values) / len(values) * ms, 2) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * ms, 2),
+        "p95_ms": round(percentile(values, 95) * ms, 2),
+        "p99_ms": round(percentile(values, 99) * ms, 2),
+        "max_ms": round(values[-1] * ms, 2) if values else 0.0,
+    }
+
+
+def compare(result: dict, baseline: dict, threshold: float) -> list:
+    """Регрессии относительно baseline: p95 выросла или req/s упал больше чем на threshold"""
+    regressions = []
+    sections = {"total": (result["total"], baseline.get("total"))}
+    for name, stats in result["operations"].items():
+        sections[name] = (stats, baseline.get("operations", {}).get(name))
+    print(f"\n{'операция':<12}{'p95, мс':>18}{'req/s':>20}")
+    for name, (current, previous) in sections.items():
+        if not previous or not current["count"]:
+            continue
+        p95_change = current["p95_ms"] / previous["p95_ms"] - 1 if previous["p95_ms"] else 0.0
+        rps_change = current["rps"] / previous["rps"] - 1 if previous["rps"] else 0.0
+        print(
+            f"{name:<12}{previous['p95_ms']:>8.1f} -> {current['p95_ms']:<7.1f}"
+            f"{previous['rps']:>9.1f} -> {current['rps']:<8.1f} ({p95_change:+.0%} / {rps_change:+.0%})"
+        )
+        if p95_change > threshold:
+            regressions.append(f"{name}: p95 {previous['p95_ms']} -> {current['p95_ms']} мс")
+        if rps_change < -threshold:
+            regressions.append(f"{name}: req/s {previous['rps']} -> {current['rps']}")
+    return regressions
+
+
+def print_report(result: dict) -> None:
+    print(f"\n{'операция':<12}{'запросов':>9}{'ошибок':>8}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}  (мс)")
+    rows = list(result["operations"].items()) + [("total", result["total"])]
+    for name, stats in rows:
+        print(
+            f"{name:<12}{stats['count']:>9}{stats['errors']:>8}{stats['rps']:>9.1f}"
+            f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}"
+        )
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_ready(base_url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    """Ждёт, пока поднятый uvicorn начнёт отвечать на /health"""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn завершился с кодом {process.returncode}")
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("uvicorn не ответил на /health")
+
+
+async def benchmark(args, weights: dict) -> dict:
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    process = None
+    lifespan = None
+
+    if args.url:
+        target, client = args.url, httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60)
+    elif args.uvicorn:
+        port = free_port()
+        env = {**os.environ, "TM_DATABASE_URL": args.database_url}
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.backend.main:app", "--port", str(port),
+             "--workers", str(args.workers), "--log-level", "warning"],
+            cwd=project_root, env=env,
+        )
+        target = f"http://127.0.0.1:{port}"
+        await wait_ready(target, process)
+        client = httpx.AsyncClient(base_url=target, limits=limits, timeout=60)
+    else:
+        # Переменные окружения читаются при импорте модулей приложения
+        os.environ["TM_DATABASE_URL"] = args.database_url
+        from app.backend.main import app
+        lifespan = app.router.lifespan_context(app)
+        await lifespan.__aenter__()
+        target = "asgi"
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+
+    try:
+        print(f"Подготовка: {args.users} польз. по {args.tasks_per_user} задач ({target})")
+        users = await setup_users(client, args.users, args.tasks_per_user, rng)
+        if args.warmup:
+            await run_load(client, users, weights, args.warmup, args.concurrency, args.seed + 1)
+        print(f"Нагрузка: {args.requests} запросов, конкурентность {args.concurrency}")
+        samples, errors, duration = await run_load(client, users, weights, args.requests, args.concurrency, args.seed)
+    finally:
+        await client.aclose()
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    all_samples = [value for values in samples.values() for value in values]
+    return {
+        "meta": {
+            "target": target,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "users": args.users,
+            "tasks_per_user": args.tasks_per_user,
+            "mix": weights,
+            "seed": args.seed,
+        },
+        "total": summarize(all_samples, sum(errors.values()), duration),
+        "operations": {name: summarize(samples[name], errors[name], duration) for name in weights},
+    }
+
+
+def main() -> None:
+    # Устанавливаем UTF-8 для Windows
+    if sys.platform == "win32":
+        sys.stdout.reconfigure(encoding='utf-8')
+        sys.stderr.reconfigure(encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description="Нагрузочный бенчмарк TaskManager API")
+    parser.add_argument("--url", help="адрес уже запущенного сервера (например http://localhost:8000)")
+    parser.add_argument("--uvicorn", action="store_true", help="запустить отдельный процесс uvicorn")
+    parser.add_argument("--workers", type=int, default=1, help="число воркеров uvicorn (с --uvicorn)")
+    parser.add_argument("--database-url", help="база для ASGI/--uvicorn (по умолчанию - временный файл SQLite)")
+    parser.add_argument("--keep-db", action="store_true", help="не удалять временную базу после прогона")
+    parser.add_argument("--concurrency", type=int, default=16, help="число одновременных клиентов")
+    parser.add_argument("--requests", type=int, default=2000, help="число замеряемых запросов")
+    parser.add_argument("--warmup", type=int, default=100, help="число запросов прогрева (не замеряются)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"веса операций (по умолчанию {DEFAULT_MIX})")
+    parser.add_argument("--users", type=int, default=4, help="число пользователей бенчмарка")
+    parser.add_argument("--tasks-per-user", type=int, default=500, help="стартовых задач на пользователя")
+    parser.add_argument("--seed", type=int, default=1, help="зерно генератора (смесь и данные)")
+    parser.add_argument("--output", help="куда сохранить результат (JSON)")
+    parser.add_argument("--baseline", help="результат прошлого запуска (JSON) для сравнения")
+    parser.add_argument("--max-regression", type=float, default=0.10, help="допустимая регрессия p95/req/s (доля)")
+    args = parser.parse_args()
+
+    try:
+        weights = parse_mix(args.mix)
+    except ValueError as exc:
+        parser.error(str(exc))
+    db_dir = None
+    if not args.url and not args.database_url:
+        db_dir = tempfile.mkdtemp(prefix="tm-bench-")
+        args.database_url = "sqlite+aiosqlite:///" + os.path.join(db_dir, "bench.db")
+
+    try:
+        result = asyncio.run(benchmark(args, weights))
+    finally:
+        if db_dir is not None:
+            if args.keep_db:
+                print(f"Временная база оставлена: {db_dir}")
+            else:
+                shutil.rmtree(db_dir, ignore_errors=True)
+    print_report(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(result, file, ensure_ascii=False, indent=2)
+        print(f"\nРезультат сохранён в {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare(result, baseline, args.max_regression)
+        if regressions:
+            print(f"\n❌ Регрессии больше {args.max_regression:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\n✅ Регрессий относительно baseline нет")
+
+
+if __name__ == "__main__":
+    main()
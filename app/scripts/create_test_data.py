@@ -14,7 +14,8 @@ sys.path.insert(0, project_root)
 from app.backend.database import init_db, AsyncSessionLocal, UserDB, RoleEnum
 from app.backend.services import task_service
 from app.backend.models import TaskCreate, TaskStatus, Priority
-from app.backend.auth import hash_password, CurrentUser
+from app.backend.auth import CurrentUser
+from app.backend.hashing import password_hasher
 from sqlalchemy import select
 
 
@@ -55,7 +56,7 @@ async def create_test_users(db):
         else:
             new_user = UserDB(
                 username=user_data["username"],
-                hashed_password=hash_password(user_data["password"]),
+                hashed_password=await password_hasher.hash(user_data["password"]),
                 role=user_data["role"]
             )
             db.add(new_user)
@@ -163,7 +164,7 @@ async def show_statistics():
         total_tasks = 0
         for user in users:
             user_obj = CurrentUser(id=user.id, username=user.username, role=user.role)
-            tasks = await task_service.get_tasks(db, current_user=user_obj)
+            tasks = (await task_service.get_tasks(db, current_user=user_obj)).items
             total_tasks += len(tasks)
             print(f"  {user.username} ({user.role.value}): {len(tasks)} задач")
         
@@ -173,7 +174,7 @@ async def show_statistics():
         admin = next((u for u in users if u.role == RoleEnum.ADMIN), None)
         if admin:
             admin_obj = CurrentUser(id=admin.id, username=admin.username, role=admin.role)
-            all_tasks = await task_service.get_tasks(db, current_user=admin_obj)
+            all_tasks = (await task_service.get_tasks(db, current_user=admin_obj)).items
             print(f"\n  Статистика по статусам (от имени админа):")
             for status in TaskStatus:
                 count = sum(1 for t in all_tasks if t.status == status)
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Генератор синтетических данных для нагрузочного тестирования
+
+Создаёт N пользователей и от десятков тысяч до миллионов задач с правдоподобными
+распределениями: у немногих пользователей много задач, старые задачи чаще
+завершены, у части задач нет срока или описания, длина текстов разная.
+Данные вставляются пачками (executemany, транзакция на пачку), пароль хэшируется
+один раз для всех пользователей. При одинаковых --seed и --anchor результат
+полностью воспроизводим.
+
+В SQLite на время загрузки снимаются построчные триггеры вставки (счётчики,
+версии, полнотекстовый индекс) и вторичные индексы tasks, после неё индексы
+строятся заново, а счётчики и поисковый индекс пересчитываются целиком - так в
+разы быстрее. Приложение на время загрузки должно быть остановлено: его записи
+в обход снятых триггеров разошлись бы со счётчиками, версиями ETag и поиском.
+Поэтому триггеры снимаются только на базе без задач или с --offline (оператор
+подтверждает, что приложение остановлено); иначе задачи вставляются с
+триггерами и индексами - медленнее, но безопасно. Если загрузка прервалась
+аварийно, повторный запуск скрипта (хотя бы с --tasks 0) всё восстановит.
+
+Пользователи называются <prefix><номер> (по умолчанию load_user_0, load_user_1, ...)
+с общим паролем --password; уже существующие переиспользуются. Чтобы добавить
+задачи в уже заполненную базу, укажите другой --seed: с тем же зерном id задач
+совпадут с уже вставленными.
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import date, datetime, time as dt_time, timedelta
+
+# Добавляем корневую директорию проекта в путь для импорта
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+WORDS = (
+    "подготовить", "проверить", "обновить", "исправить", "согласовать", "отправить", "написать",
+    "обсудить", "запустить", "протестировать", "настроить", "перенести", "оптимизировать",
+    "отчёт", "релиз", "встречу", "документацию", "сервер", "базу", "данных", "клиента", "договор",
+    "презентацию", "бюджет", "план", "дизайн", "макет", "интеграцию", "api", "ошибку", "тесты",
+    "сборку", "миграцию", "квартальный", "новый", "срочно", "по", "для", "с", "команды", "проекта",
+    "поставщика", "мобильного", "приложения", "сайта", "отдела", "продаж", "поддержки", "аналитики",
+)
+
+# Средняя длина слова словаря с пробелом
+_WORD_LENGTH = sum(len(word) + 1 for word in WORDS) / len(WORDS)
+
+# Доли статусов и приоритетов; доля задач без срока и без описания
+PRIORITY_WEIGHTS = {"LOW": 0.3, "MEDIUM": 0.5, "HIGH": 0.2}
+NO_DEADLINE_SHARE = 0.35
+NO_DESCRIPTION_SHARE = 0.3
+
+# Триггеры AFTER INSERT ON tasks, которые снимаются на время загрузки (вместе с индексами)
+INSERT_TRIGGERS = ("tasks_counters_ai", "tasks_fts_ai", "tasks_version_ai")
+
+
+def make_uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def make_text(rng: random.Random, length: int) -> str:
+    """Текст из словаря длиной около length символов"""
+    return " ".join(rng.choices(WORDS, k=max(1, round(length / _WORD_LENGTH))))
+
+
+class TaskGenerator:
+    """Генерация строк задач (значения для INSERT) с заданными распределениями"""
+
+    def __init__(self, rng: random.Random, user_ids: list, anchor: datetime, history_days: int, enums):
+        self.rng = rng
+        self.user_ids = user_ids
+        self.anchor = anchor
+        self.history = timedelta(days=history_days)
+        status_enum, priority_enum = enums
+        self.created, self.in_progress, self.completed = (
+            status_enum.CREATED, status_enum.IN_PROGRESS, status_enum.COMPLETED
+        )
+        self.priorities = [priority_enum[name] for name in PRIORITY_WEIGHTS]
+        self.priority_weights = list(PRIORITY_WEIGHTS.values())
+        # Активность пользователей по Парето: немногие владеют большей частью задач
+        self.user_weights = [rng.paretovariate(1.2) for _ in user_ids]
+
+    def rows(self, count: int) -> list:
+        rng = self.rng
+        owners = rng.choices(self.user_ids, weights=self.user_weights, k=count)
+        priorities = rng.choices(self.priorities, weights=self.priority_weights, k=count)
+        rows = []
+        for owner, priority in zip(owners, priorities):
+            # Свежих задач больше, чем старых
+            age = rng.random() ** 2
+            created_at = self.anchor - self.history * age
+            # Чем старше задача, тем вероятнее, что она завершена
+            roll = rng.random()
+            if roll < 0.15 + 0.7 * age:
+                status = self.completed
+            elif roll < 0.4 + 0.6 * age:
+                status = self.in_progress
+            else:
+                status = self.created
+            touched = rng.random() if status is not self.created else rng.random() * 0.05
+            updated_at = created_at + (self.anchor - created_at) * touched
+            deadline = None
+            if rng.random() >= NO_DEADLINE_SHARE:
+                deadline = created_at + timedelta(days=rng.lognormvariate(math.log(14), 0.8))
+            description = None
+            if rng.random() >= NO_DESCRIPTION_SHARE:
+                description = make_text(rng, min(990, int(rng.lognormvariate(math.log(120), 0.9))))[:1000]
+            title = make_text(rng, rng.randint(10, 80)).capitalize()
+            rows.append({
+                "id": make_uuid(rng),
+                "user_id": owner,
+                "title": title[:200],
+                "description": description,
+                "status": status,
+                "priority": priority,
+                "deadline": deadline,
+                "created_at": created_at,
+                "updated_at": updated_at,
+            })
+        return rows
+
+
+async def can_suspend_maintenance(db, offline: bool) -> bool:
+    """Можно ли снять триггеры: база без задач или оператор подтвердил --offline"""
+    from sqlalchemy import select
+    from app.backend.database import TaskDB
+
+    if offline:
+        return True
+    return (await db.execute(select(TaskDB.id).limit(1))).first() is None
+
+
+async def suspend_maintenance(db) -> None:
+    """Снимает триггеры вставки и вторичные индексы tasks (только SQLite, приложение остановлено)"""
+    from sqlalchemy import text
+    from app.backend.database import TaskDB
+
+    for trigger in INSERT_TRIGGERS:
+        await db.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    for index in TaskDB.__table__.indexes:
+        await db.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+    await db.commit()
+
+
+async def restore_maintenance(db) -> None:
+    """
+    Возвращает триггеры и индексы tasks, пересчитывает счётчики и полнотекстовый
+    индекс и сверяет счётчики с таблицей tasks
+    """
+    from sqlalchemy import text
+    from app.backend.database import (
+        TaskDB, TASK_COUNTERS_TRIGGERS, TASKS_FTS_DDL, TASK_VERSION_TRIGGERS,
+        rebuild_task_counters, rebuild_search_index,
+    )
+    from app.backend.services import task_service
+
+    print("Построение индексов, пересчёт счётчиков и полнотекстового индекса...")
+    for statement in TASK_COUNTERS_TRIGGERS + TASKS_FTS_DDL + TASK_VERSION_TRIGGERS:
+        await db.execute(text(statement))
+    connection = await db.connection()
+    for index in TaskDB.__table__.indexes:
+        await connection.run_sync(lambda sync_conn, index=index: index.create(sync_conn, checkfirst=True))
+    await rebuild_task_counters(db)
+    await rebuild_search_index(db)
+    await db.commit()
+    # Статистика для планировщика запросов по свежим данным
+    await db.execute(text("ANALYZE"))
+    await db.commit()
+    drift = await task_service.verify_counters(db)
+    if drift:
+        # Кто-то писал в базу между пересчётом и сверкой: пересчитываем ещё раз
+        print(f"⚠️  Счётчики разошлись с tasks ({len(drift)}), пересчёт...")
+        await task_service.rebuild_counters(db)
+
+
+async def run(args) -> None:
+    # Модули приложения импортируются после выбора базы: TM_DATABASE_URL читается при импорте
+    from sqlalchemy import insert, select
+    from app.backend.database import (
+        init_db, engine, AsyncSessionLocal, UserDB, TaskDB, RoleEnum, TaskStatusEnum, PriorityEnum, IS_SQLITE,
+    )
+    from app.backend.hashing import password_hasher
+
+    rng = random.Random(args.seed)
+    anchor = datetime.combine(args.anchor, dt_time())
+    await init_db()
+    print(f"База: {engine.url.render_as_string(hide_password=True)}")
+    started = time.perf_counter()
+
+    async with AsyncSessionLocal() as db:
+        usernames = [f"{args.prefix}{index}" for index in range(args.users)]
+        user_ids = [make_uuid(rng) for _ in usernames]
+        existing = dict((await db.execute(
+            select(UserDB.username, UserDB.id).where(UserDB.username.in_(usernames))
+        )).all())
+        missing = [(name, user_id) for name, user_id in zip(usernames, user_ids) if name not in existing]
+        if missing:
+            # Один хэш на всех: bcrypt на каждого пользователя занял бы минуты
+            hashed = await password_hasher.hash(args.password)
+            await db.execute(insert(UserDB.__table__), [
+                {"id": user_id, "username": name, "hashed_password": hashed, "role": RoleEnum.USER}
+                for name, user_id in missing
+            ])
+            await db.commit()
+        password_hasher.shutdown()
+        user_ids = [existing.get(name, user_id) for name, user_id in zip(usernames, user_ids)]
+        print(f"Пользователи: {len(missing)} создано, {len(existing)} уже было")
+
+        async def insert_batch(rows: list) -> None:
+            await db.execute(insert(TaskDB.__table__), rows)
+            await db.commit()
+
+        generator = TaskGenerator(rng, user_ids, anchor, args.history_days, (TaskStatusEnum, PriorityEnum))
+        if IS_SQLITE and args.tasks:
+            if await can_suspend_maintenance(db, args.offline):
+                await suspend_maintenance(db)
+            else:
+                print("В базе уже есть задачи: вставка с триггерами и индексами (--offline - быстрее, "
+                      "если приложение остановлено)")
+        pending = None
+        try:
+            done = 0
+            next_report = 0.0
+            while done < args.tasks:
+                # Следующая пачка генерируется, пока предыдущая пишется в БД (в потоке драйвера)
+                rows = generator.rows(min(args.batch_size, args.tasks - done))
+                if pending is not None:
+                    await pending
+                pending = asyncio.create_task(insert_batch(rows))
+                await asyncio.sleep(0)
+                done += len(rows)
+                elapsed = time.perf_counter() - started
+                if elapsed >= next_report or done == args.tasks:
+                    next_report = elapsed + 5
+                    print(f"  задач: {done}/{args.tasks} ({done / elapsed:.0f}/с)")
+            if pending is not None:
+                await pending
+        finally:
+            if pending is not None and not pending.done():
+                # Прервали (Ctrl+C): сессию можно трогать только после текущей пачки
+                await asyncio.gather(pending, return_exceptions=True)
+            if IS_SQLITE:
+                await db.rollback()
+                await restore_maintenance(db)
+
+    print(f"✅ Готово за {time.perf_counter() - started:.1f} с. Вход: {args.prefix}0 / {args.password}")
+
+
+def main() -> None:
+    # Устанавливаем UTF-8 для Windows
+    if sys.platform == "win32":
+        sys.stdout.reconfigure(encoding='utf-8')
+        sys.stderr.reconfigure(encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description="Генерация синтетических пользователей и задач")
+    parser.add_argument("--tasks", type=int, default=10000, help="число задач")
+    parser.add_argument("--users", type=int, default=100, help="число пользователей")
+    parser.add_argument("--seed", type=int, default=42, help="зерно генератора")
+    parser.add_argument("--anchor", type=date.fromisoformat, default=date.today(),
+                        help="дата 'сейчас' для дат задач, ГГГГ-ММ-ДД (по умолчанию - сегодня)")
+    parser.add_argument("--history-days", type=int, default=365, help="за сколько дней до anchor создаются задачи")
+    parser.add_argument("--batch-size", type=int, default=5000, help="задач в одной транзакции")
+    parser.add_argument("--prefix", default="load_user_", help="префикс имён пользователей")
+    parser.add_argument("--password", default="loadtest123", help="пароль всех пользователей")
+    parser.add_argument("--database-url", help="база (по умолчанию - TM_DATABASE_URL или стандартная SQLite)")
+    parser.add_argument("--offline", action="store_true",
+                        help="приложение остановлено: снять триггеры и индексы и на базе с задачами")
+    args = parser.parse_args()
+    if args.tasks < 0 or args.users < 1 or args.batch_size < 1:
+        parser.error("--tasks >= 0, --users >= 1, --batch-size >= 1")
+    if args.database_url:
+        os.environ["TM_DATABASE_URL"] = args.database_url
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
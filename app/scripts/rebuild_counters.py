@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Скрипт проверки и пересчёта счётчиков статистики (таблица task_counters)
+
+По умолчанию только сверяет счётчики с таблицей tasks и печатает расхождения.
+С флагом --fix пересчитывает task_counters заново.
+С флагом --reindex-search дополнительно переиндексирует полнотекстовый поиск
+(tasks_fts) - это нужно, например, после VACUUM.
+"""
+
+import argparse
+import asyncio
+import sys
+import os
+
+# Добавляем корневую директорию проекта в путь для импорта
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from app.backend.database import init_db, AsyncSessionLocal, IS_SQLITE, rebuild_search_index
+from app.backend.services import task_service
+
+
+async def run(fix: bool, reindex_search: bool) -> int:
+    """Сверка (и при необходимости пересчёт) счётчиков; возвращает код выхода"""
+    if not IS_SQLITE:
+        print("Счётчики task_counters поддерживаются только для SQLite")
+        return 1
+
+    await init_db()
+    async with AsyncSessionLocal() as db:
+        if reindex_search:
+            await rebuild_search_index(db)
+            await db.commit()
+            print("✅ Полнотекстовый индекс tasks_fts перестроен")
+
+        drift = await task_service.verify_counters(db)
+        if not drift:
+            print("✅ Счётчики совпадают с таблицей tasks")
+            return 0
+
+        print(f"⚠️ Найдено расхождений: {len(drift)}")
+        for item in drift:
+            print(f"  {item['user_id']}.{item['field']}: ожидалось {item['expected']}, в счётчике {item['actual']}")
+
+        if not fix:
+            print("\nДля пересчёта запустите скрипт с флагом --fix")
+            return 1
+
+        await task_service.rebuild_counters(db)
+        remaining = await task_service.verify_counters(db)
+        if remaining:
+            print(f"❌ После пересчёта осталось расхождений: {len(remaining)}")
+            return 1
+        print("✅ Счётчики пересчитаны")
+        return 0
+
+
+def main() -> None:
+    # Устанавливаем UTF-8 для Windows
+    if sys.platform == "win32":
+        sys.stdout.reconfigure(encoding='utf-8')
+        sys.stderr.reconfigure(encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description="Проверка и пересчёт счётчиков статистики задач")
+    parser.add_argument("--fix", action="store_true", help="пересчитать task_counters при расхождениях")
+    parser.add_argument("--reindex-search", action="store_true", help="перестроить полнотекстовый индекс tasks_fts")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.fix, args.reindex_search)))
+
+
+if __name__ == "__main__":
+    main()
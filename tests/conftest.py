@@ -0,0 +1,68 @@
+"""
+Общие фикстуры тестов API.
+
+Приложение работает на временной файловой SQLite (TM_DATABASE_URL задаётся до
+импорта модулей app, которые читают его при импорте). Каждый сценарий получает
+пустую базу, запущенный lifespan и httpx-клиент поверх ASGI без сервера.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+_db_dir = tempfile.TemporaryDirectory(prefix="tm-tests-")
+DB_PATH = os.path.join(_db_dir.name, "test.db")
+os.environ["TM_DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+
+import httpx  # noqa: E402
+
+from app.backend.main import app  # noqa: E402
+
+
+class ApiClient:
+    """httpx-клиент приложения и вход под пользователями"""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.http = client
+
+    async def login(self, username: str, password: str, register: bool = True) -> dict:
+        """Заголовки авторизации пользователя (с регистрацией, если register)"""
+        if register:
+            await self.http.post("/api/v1/auth/register", json={"username": username, "password": password})
+        response = await self.http.post("/api/v1/auth/login", data={"username": username, "password": password})
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def admin(self) -> dict:
+        """Заголовки встроенного администратора (создаётся при старте приложения)"""
+        return await self.login("admin", "admin123", register=False)
+
+
+def _remove_database() -> None:
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(DB_PATH + suffix)
+        except FileNotFoundError:
+            pass
+
+
+async def _run_scenario(scenario):
+    _remove_database()
+    lifespan = app.router.lifespan_context(app)
+    await lifespan.__aenter__()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await scenario(ApiClient(client))
+    finally:
+        await lifespan.__aexit__(None, None, None)
+
+
+@pytest.fixture
+def run_api():
+    """run_api(scenario): выполняет async scenario(api) на свежей базе"""
+    return lambda scenario: asyncio.run(_run_scenario(scenario))
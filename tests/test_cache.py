@@ -0,0 +1,49 @@
+"""Фоновые инвалидации CacheBackend.discard/discard_all"""
+import asyncio
+import gc
+
+from app.backend.cache import CacheBackend
+
+
+class SlowBackend(CacheBackend):
+    """Хранилище с задержкой операций, как у внешнего кэша"""
+
+    def __init__(self):
+        super().__init__()
+        self.data = {}
+
+    async def get(self, key):
+        await asyncio.sleep(0.01)
+        return self.data.get(key)
+
+    async def set(self, key, value):
+        await asyncio.sleep(0.01)
+        self.data[key] = value
+
+    async def delete(self, key):
+        await asyncio.sleep(0.01)
+        self.data.pop(key, None)
+
+    async def clear(self):
+        await asyncio.sleep(0.01)
+        self.data.clear()
+
+
+def test_settle_waits_for_background_invalidations():
+    async def scenario():
+        backend = SlowBackend()
+        await backend.set("a", 1)
+        await backend.set("b", 2)
+        backend.discard("a")
+        # Задачи инвалидации держит сам backend: сборка мусора их не теряет
+        gc.collect()
+        await backend.settle()
+        assert await backend.get("a") is None and await backend.get("b") == 2
+
+        backend.discard_all()
+        gc.collect()
+        await backend.settle()
+        assert backend.data == {}
+        assert not backend._invalidations
+
+    asyncio.run(scenario())
@@ -0,0 +1,62 @@
+"""Постраничная дельта-синхронизация GET /tasks/changes"""
+from datetime import datetime, timedelta, timezone
+
+from app.backend.services import TOMBSTONE_RETENTION
+
+TASKS_URL = "/api/v1/tasks/"
+CHANGES_URL = "/api/v1/tasks/changes"
+
+
+async def _all_pages(api, headers, **params):
+    """Все страницы изменений по next_cursor"""
+    pages = []
+    cursor = None
+    while True:
+        response = await api.http.get(CHANGES_URL, headers=headers, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        pages.append(response.json())
+        cursor = pages[-1]["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_changes_are_paged_with_one_watermark(run_api):
+    async def scenario(api):
+        headers = await api.login("changes_user", "password123")
+        since = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()
+        created = await api.http.post(
+            f"{TASKS_URL}bulk", headers=headers, json={"items": [{"title": f"задача {index}"} for index in range(7)]},
+        )
+        ids = [item["id"] for item in created.json()]
+        response = await api.http.request("DELETE", f"{TASKS_URL}bulk", headers=headers, json={"ids": ids[:2]})
+        assert response.status_code == 200
+
+        snapshot = await _all_pages(api, headers, limit=3)
+        assert [len(page["changed"]) for page in snapshot] == [3, 2]
+        assert {task["id"] for page in snapshot for task in page["changed"]} == set(ids[2:])
+        assert len({page["watermark"] for page in snapshot}) == 1
+
+        delta = await _all_pages(api, headers, since=since, limit=2)
+        assert [len(page["changed"]) for page in delta] == [2, 2, 1]
+        assert sorted(delta[0]["deleted"]) == sorted(ids[:2])
+        assert all(page["deleted"] == [] for page in delta[1:])
+        assert not any(page["resync"] for page in delta)
+
+    run_api(scenario)
+
+
+def test_changes_since_older_than_retention_requires_resync(run_api):
+    async def scenario(api):
+        headers = await api.login("changes_user", "password123")
+        await api.http.post(TASKS_URL, headers=headers, json={"title": "задача"})
+        since = (datetime.now(timezone.utc) - TOMBSTONE_RETENTION - timedelta(hours=1)).isoformat()
+        response = await api.http.get(CHANGES_URL, headers=headers, params={"since": since})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["resync"] is True
+        assert body["changed"] == [] and body["deleted"] == [] and body["next_cursor"] is None
+
+        response = await api.http.get(CHANGES_URL, headers=headers, params={"cursor": "не-курсор"})
+        assert response.status_code == 400
+
+    run_api(scenario)
@@ -0,0 +1,58 @@
+"""Условные запросы (ETag) после пересчёта счётчиков task_counters"""
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, select, text
+
+from app.backend.database import (
+    AsyncSessionLocal, TaskDB, UserDB, TaskStatusEnum, PriorityEnum,
+    TASK_COUNTERS_TRIGGERS, TASK_VERSION_TRIGGERS,
+)
+from app.backend.services import task_service
+
+TASKS_URL = "/api/v1/tasks/"
+
+
+async def _insert_without_triggers(user_id: str, count: int) -> None:
+    """Вставка задач в обход триггеров счётчиков и версий (как при загрузке дампа)"""
+    now = datetime.now(timezone.utc)
+    async with AsyncSessionLocal() as db:
+        for trigger in ("tasks_counters_ai", "tasks_version_ai"):
+            await db.execute(text(f"DROP TRIGGER {trigger}"))
+        await db.execute(insert(TaskDB.__table__), [
+            {
+                "id": str(uuid.uuid4()), "user_id": user_id, "title": f"задача {index}",
+                "status": TaskStatusEnum.CREATED, "priority": PriorityEnum.MEDIUM,
+                "created_at": now, "updated_at": now,
+            }
+            for index in range(count)
+        ])
+        for statement in TASK_COUNTERS_TRIGGERS + TASK_VERSION_TRIGGERS:
+            await db.execute(text(statement))
+        await db.commit()
+
+
+def test_rebuild_invalidates_etags_issued_on_empty_db(run_api):
+    async def scenario(api):
+        admin = await api.admin()
+        user = await api.login("etag_user", "password123")
+        etags = {}
+        for name, headers in (("admin", admin), ("user", user)):
+            response = await api.http.get(TASKS_URL, headers=headers)
+            assert response.status_code == 200
+            etags[name] = response.headers["ETag"]
+
+        async with AsyncSessionLocal() as db:
+            user_id = (await db.execute(select(UserDB.id).where(UserDB.username == "etag_user"))).scalar_one()
+        await _insert_without_triggers(user_id, 5)
+        async with AsyncSessionLocal() as db:
+            await task_service.rebuild_counters(db)
+
+        for name, headers in (("admin", admin), ("user", user)):
+            response = await api.http.get(TASKS_URL, headers={**headers, "If-None-Match": etags[name]})
+            assert response.status_code == 200, name
+            assert len(response.json()["items"]) == 5
+            statistics = await api.http.get(f"{TASKS_URL}statistics/summary", headers=headers)
+            assert statistics.json()["total"] == 5
+
+    run_api(scenario)
@@ -0,0 +1,60 @@
+"""Генератор синтетических данных (app/scripts/generate_dataset.py) и кэширование ответов"""
+import argparse
+from datetime import date
+
+from app.scripts import generate_dataset
+
+TASKS_URL = "/api/v1/tasks/"
+
+
+def _dataset_args(**overrides) -> argparse.Namespace:
+    args = dict(
+        tasks=2000, users=5, seed=7, anchor=date(2026, 1, 1), history_days=90,
+        batch_size=500, prefix="load_user_", password="loadtest123", offline=False,
+    )
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+
+def test_generated_data_invalidates_earlier_etags(run_api):
+    async def scenario(api):
+        admin = await api.admin()
+        etags = {}
+        for url in (TASKS_URL, f"{TASKS_URL}statistics/summary"):
+            response = await api.http.get(url, headers=admin)
+            assert response.status_code == 200
+            etags[url] = response.headers["ETag"]
+
+        await generate_dataset.run(_dataset_args())
+
+        for url, etag in etags.items():
+            response = await api.http.get(url, headers={**admin, "If-None-Match": etag})
+            assert response.status_code == 200, url
+        statistics = await api.http.get(f"{TASKS_URL}statistics/summary", headers=admin)
+        assert statistics.json()["total"] == 2000
+
+        user = await api.login("load_user_0", "loadtest123", register=False)
+        page = await api.http.get(TASKS_URL, params={"limit": 1}, headers=user)
+        assert page.status_code == 200 and page.json()["items"]
+
+    run_api(scenario)
+
+
+def test_database_with_tasks_keeps_triggers_without_offline(run_api, monkeypatch):
+    async def refuse(db):
+        raise AssertionError("триггеры сняты на базе с задачами без --offline")
+
+    async def scenario(api):
+        admin = await api.admin()
+        response = await api.http.post(TASKS_URL, json={"title": "живая задача"}, headers=admin)
+        assert response.status_code == 201
+
+        monkeypatch.setattr(generate_dataset, "suspend_maintenance", refuse)
+        await generate_dataset.run(_dataset_args(tasks=300))
+
+        statistics = await api.http.get(f"{TASKS_URL}statistics/summary", headers=admin)
+        assert statistics.json()["total"] == 301
+        found = await api.http.get(TASKS_URL, params={"search": "живая"}, headers=admin)
+        assert [task["title"] for task in found.json()["items"]] == ["живая задача"]
+
+    run_api(scenario)
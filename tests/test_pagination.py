@@ -0,0 +1,158 @@
+"""Постраничная выдача GET /tasks/ по ключу (keyset): все сортировки, поиск, курсоры"""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app.backend.database import AsyncSessionLocal
+from app.backend.services import SORT_FIELDS
+
+TASKS_URL = "/api/v1/tasks/"
+SEARCH = "report"
+PAGE_SIZE = 4
+
+# Порядок в БД: статус хранится именем enum, приоритет - весом priority_rank
+_STATUS_KEY = {"новая": "CREATED", "в работе": "IN_PROGRESS", "завершено": "COMPLETED"}
+_PRIORITY_KEY = {"низкий": 1, "средний": 2, "высокий": 3}
+_STATUSES = list(_STATUS_KEY)
+_PRIORITIES = list(_PRIORITY_KEY)
+
+
+def _task(index: int) -> dict:
+    """Задача с повторяющимися статусами, приоритетами и сроками (в том числе пустыми)"""
+    if index % 3 == 0:
+        title, description = f"{SEARCH} {index}", None
+    elif index % 3 == 1:
+        title, description = f"note {index}", f"{SEARCH} {SEARCH} weekly" if index % 2 else "plain"
+    else:
+        title, description = f"{SEARCH} {SEARCH}", "same text"
+    return {
+        "title": title,
+        "description": description,
+        "status": _STATUSES[index % 3],
+        "priority": _PRIORITIES[index % 2 + index % 3 // 2],
+        "deadline": None if index % 4 == 0 else f"2026-0{index % 5 + 1}-15T12:00:00",
+    }
+
+
+async def _seed(api, headers) -> None:
+    """Задачи одной пачкой (одинаковые created_at/updated_at), по одной и с обновлениями"""
+    response = await api.http.post(f"{TASKS_URL}bulk", headers=headers, json={"items": [_task(i) for i in range(24)]})
+    assert response.status_code == 200, response.text
+    ids = [item["id"] for item in response.json()]
+    for index in range(24, 32):
+        response = await api.http.post(TASKS_URL, headers=headers, json=_task(index))
+        assert response.status_code == 201, response.text
+    for task_id in ids[::5]:
+        response = await api.http.put(f"{TASKS_URL}{task_id}", headers=headers, json={"status": "в работе"})
+        assert response.status_code == 200, response.text
+
+
+async def _walk(api, headers, **params) -> list:
+    """Все страницы по next_cursor"""
+    tasks, cursor = [], None
+    while True:
+        page_params = {**params, "limit": PAGE_SIZE, **({"cursor": cursor} if cursor else {})}
+        response = await api.http.get(TASKS_URL, headers=headers, params=page_params)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        assert len(body["items"]) <= PAGE_SIZE
+        tasks.extend(body["items"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return tasks
+
+
+def _expected(tasks: list, sort_by: str, sort_order: str) -> list:
+    """Ожидаемый порядок id: ключ сортировки, затем id; NULL первыми при asc и последними при desc"""
+    def key(task):
+        value = task[sort_by]
+        if sort_by == "status":
+            value = _STATUS_KEY[value]
+        elif sort_by == "priority":
+            value = _PRIORITY_KEY[value]
+        elif value is not None:
+            value = datetime.fromisoformat(value)
+        return (value is not None, value), task["id"]
+
+    # NULL-ы: (False, None) < (True, ...) при asc; reverse ставит их в конец при desc
+    ordered = sorted(tasks, key=key, reverse=sort_order == "desc")
+    return [task["id"] for task in ordered]
+
+
+async def _relevance_order(owner: str) -> list:
+    """Порядок по bm25 и id прямо из FTS-индекса"""
+    async with AsyncSessionLocal() as db:
+        rows = await db.execute(text(
+            "SELECT tasks.id FROM tasks JOIN tasks_fts ON tasks_fts.rowid = tasks.rowid "
+            "JOIN users ON users.id = tasks.user_id "
+            "WHERE tasks_fts MATCH :query AND users.username = :owner ORDER BY tasks_fts.rank, tasks.id"
+        ), {"query": f'"{SEARCH}"*', "owner": owner})
+        return [row.id for row in rows]
+
+
+def _matches(task: dict) -> bool:
+    return SEARCH in task["title"] or SEARCH in (task["description"] or "")
+
+
+def test_pages_cover_full_ordering_for_every_sort(run_api):
+    async def scenario(api):
+        headers = await api.login("pages_user", "password123")
+        await _seed(api, headers)
+        response = await api.http.get(TASKS_URL, headers=headers, params={"limit": 1000})
+        everything = response.json()["items"]
+        assert len(everything) == 32
+        found = [task for task in everything if _matches(task)]
+        assert 0 < len(found) < len(everything)
+
+        for search in (None, SEARCH):
+            for sort_by in (None, *SORT_FIELDS):
+                for sort_order in ("asc", "desc"):
+                    params = {"sort_order": sort_order}
+                    if sort_by:
+                        params["sort_by"] = sort_by
+                    if search:
+                        params["search"] = search
+                    walked = [task["id"] for task in await _walk(api, headers, **params)]
+                    assert len(walked) == len(set(walked)), params
+
+                    if sort_by is None and search:
+                        expected = await _relevance_order("pages_user")
+                    else:
+                        effective = (sort_by, sort_order) if sort_by else ("created_at", "desc")
+                        expected = _expected(found if search else everything, *effective)
+                    assert walked == expected, params
+
+    run_api(scenario)
+
+
+def _tamper(cursor: str, **changes) -> str:
+    payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    raw = json.dumps({**payload, **changes}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def test_tampered_cursor_is_rejected(run_api):
+    async def scenario(api):
+        headers = await api.login("pages_user", "password123")
+        await _seed(api, headers)
+        params = {"sort_by": "deadline", "sort_order": "asc", "limit": PAGE_SIZE}
+        response = await api.http.get(TASKS_URL, headers=headers, params=params)
+        cursor = response.json()["next_cursor"]
+        assert cursor
+
+        for bad in (
+            "не-курсор",
+            cursor[:-3],
+            _tamper(cursor, s="status"),
+            _tamper(cursor, o="desc"),
+            _tamper(cursor, v="не дата"),
+            _tamper(cursor, v=["2026-01-15T12:00:00"]),
+        ):
+            response = await api.http.get(TASKS_URL, headers=headers, params={**params, "cursor": bad})
+            assert response.status_code == 400, bad
+        response = await api.http.get(TASKS_URL, headers=headers, params={**params, "sort_by": "priority", "cursor": cursor})
+        assert response.status_code == 400
+
+    run_api(scenario)
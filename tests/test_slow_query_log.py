@@ -0,0 +1,31 @@
+"""Лог медленных SQL-запросов: без хэшей паролей и полного текста задач"""
+import logging
+
+from app.backend import database
+
+TASKS_URL = "/api/v1/tasks/"
+
+
+def test_slow_query_log_hides_secrets_and_shortens_text(run_api, monkeypatch, caplog):
+    title = "секретный план " * 10
+
+    async def scenario(api):
+        headers = await api.login("slow_user", "password123")
+        # Порог почти 0: в лог попадают все запросы
+        monkeypatch.setattr(database, "SLOW_QUERY_MS", 1e-9)
+        with caplog.at_level(logging.WARNING, logger=database.logger.name):
+            await api.http.post("/api/v1/auth/register", json={"username": "slow_other", "password": "password123"})
+            response = await api.http.post(TASKS_URL, json={"title": title}, headers=headers)
+            assert response.status_code == 201
+        monkeypatch.setattr(database, "SLOW_QUERY_MS", 0)
+
+    run_api(scenario)
+
+    messages = [record.getMessage() for record in caplog.records if record.name == database.logger.name]
+    user_inserts = [message for message in messages if "INSERT INTO users" in message]
+    task_inserts = [message for message in messages if "INSERT INTO tasks" in message]
+    assert user_inserts and task_inserts
+    assert all("параметры: <скрыты>" in message for message in user_inserts)
+    assert not any("$2b$" in message or "slow_other" in message for message in messages)
+    assert not any(title in message for message in messages)
+    assert any(f"…({len(title)})" in message for message in task_inserts)
@@ -0,0 +1,90 @@
+"""Очередь записи с групповым коммитом (WriteQueue): пачки, изоляция ошибок, остановка"""
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.backend.database import WriteQueue, WriteQueueStopped
+
+
+def _run_with_queue(tmp_path, scenario, **options):
+    """scenario(queue, session_factory) на своей SQLite с таблицей items(name UNIQUE)"""
+    async def main():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'queue.db'}")
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        async with engine.begin() as connection:
+            await connection.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT UNIQUE)"))
+            await connection.execute(text("INSERT INTO items (name) VALUES ('taken')"))
+        queue = WriteQueue(session_factory, **options)
+        await queue.start()
+        try:
+            return await scenario(queue, session_factory)
+        finally:
+            await queue.stop()
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+def _insert(name: str):
+    async def operation(session):
+        await session.execute(text("INSERT INTO items (name) VALUES (:name)"), {"name": name})
+        return name
+    return operation
+
+
+async def _names(session_factory) -> set:
+    async with session_factory() as session:
+        return set((await session.execute(text("SELECT name FROM items"))).scalars())
+
+
+def test_concurrent_operations_share_one_commit(tmp_path):
+    async def scenario(queue, session_factory):
+        results = await asyncio.gather(*[queue.submit(_insert(f"item {index}")) for index in range(5)])
+        assert results == [f"item {index}" for index in range(5)]
+        assert (queue.batches, queue.operations) == (1, 5)
+        assert await _names(session_factory) == {"taken", *results}
+
+    _run_with_queue(tmp_path, scenario, max_delay=0.05)
+
+
+def test_failed_operation_does_not_roll_back_its_batch(tmp_path):
+    async def scenario(queue, session_factory):
+        names = ["a", "b", "taken", "c", "d"]
+        results = await asyncio.gather(*[queue.submit(_insert(name)) for name in names], return_exceptions=True)
+        assert [isinstance(result, IntegrityError) for result in results] == [False, False, True, False, False]
+        assert queue.batches == 1
+        assert await _names(session_factory) == set(names)
+
+    _run_with_queue(tmp_path, scenario, max_delay=0.05)
+
+
+def test_stop_fails_operations_queued_behind_it(tmp_path):
+    async def scenario(queue, session_factory):
+        release = asyncio.Event()
+
+        async def slow(session):
+            await release.wait()
+            return await _insert("slow")(session)
+
+        in_flight = asyncio.create_task(queue.submit(slow))
+        await asyncio.sleep(0.01)
+        stopping = asyncio.create_task(queue.stop())
+        await asyncio.sleep(0)
+        assert not queue.running
+        with pytest.raises(WriteQueueStopped):
+            await queue.submit(_insert("late"))
+
+        # Запрос, прошедший проверку running до начала остановки, попал в очередь за сигналом
+        straggler = asyncio.get_running_loop().create_future()
+        queue._queue.put_nowait((_insert("straggler"), straggler))
+        release.set()
+        await asyncio.wait_for(stopping, timeout=5)
+        assert await in_flight == "slow"
+        with pytest.raises(WriteQueueStopped):
+            await asyncio.wait_for(straggler, timeout=5)
+        assert await _names(session_factory) == {"taken", "slow"}
+
+    _run_with_queue(tmp_path, scenario)